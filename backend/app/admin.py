@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from auth import require_admin
+from bulk_import import BULK_BATCH_SIZE, import_users, lines_from_chunks
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+CONTENT_TYPE_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# -------------------- Bulk user import --------------------
+@router.post("/users/import")
+async def bulk_import_users(
+    request: Request,
+    format: str | None = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(BULK_BATCH_SIZE, ge=1, le=10000),
+):
+    """Create users from a CSV or NDJSON request body (username, email, password).
+
+    The body is read as a stream, so uploads of any size use constant memory.
+    Returns counts, rows/sec and per-row errors.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        format = CONTENT_TYPE_FORMATS.get(content_type)
+        if format is None:
+            raise HTTPException(status_code=415, detail="Send text/csv or application/x-ndjson, or pass ?format=")
+    return await import_users(lines_from_chunks(request.stream()), format, batch_size)
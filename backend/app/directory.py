@@ -0,0 +1,109 @@
+import csv
+import io
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from auth import get_token_claims, require_admin
+from database import db
+from models import DirectoryPage
+from responses import dumps, model_response
+from settings import settings
+
+router = APIRouter()
+
+DIRECTORY_MAX_PAGE_SIZE = settings.get_int("DIRECTORY_MAX_PAGE_SIZE", 200)
+# Documents per getMore while exporting; bounds memory regardless of collection size
+EXPORT_BATCH_SIZE = settings.get_int("EXPORT_BATCH_SIZE", 1000)
+# Flush the export stream once this much output is buffered
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+DIRECTORY_FIELDS = ("username", "bio")
+EXPORT_FIELDS = ("username", "email", "bio")
+
+
+# -------------------- Helpers --------------------
+def _fields(requested: str | None, allowed: tuple[str, ...]) -> list[str]:
+    if not requested:
+        return list(allowed)
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = set(fields) - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def _row(doc: dict, fields: list[str]) -> dict:
+    row = {"id": str(doc["_id"])}
+    row.update({field: doc.get(field) for field in fields})
+    return row
+
+# -------------------- Directory --------------------
+@router.get("", response_model=DirectoryPage)
+async def list_users(
+    after: str | None = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1),
+    fields: str | None = Query(None, description="Comma-separated: username, bio"),
+    claims: dict = Depends(get_token_claims),
+):
+    """One page of the user directory, ordered by _id.
+
+    Keyset pagination: each page starts after the last _id of the previous one,
+    so deep pages cost the same as the first (no skip()).
+    """
+    limit = min(limit, DIRECTORY_MAX_PAGE_SIZE)
+    selected = _fields(fields, DIRECTORY_FIELDS)
+    query = {}
+    if after:
+        try:
+            query["_id"] = {"$gt": ObjectId(after)}
+        except InvalidId:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Fetch one extra document to know whether another page exists
+    cursor = db.users.find(query, {field: 1 for field in selected}).sort("_id", 1).limit(limit + 1)
+    docs = await cursor.to_list(length=limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    return model_response(DirectoryPage(
+        users=[_row(doc, selected) for doc in docs],
+        next_cursor=str(docs[-1]["_id"]) if has_more else None,
+    ))
+
+# -------------------- Export --------------------
+async def _export_ndjson(cursor, fields):
+    buffer = bytearray()
+    async for doc in cursor:
+        buffer += dumps(_row(doc, fields)) + b"\n"
+        if len(buffer) >= EXPORT_CHUNK_BYTES:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+async def _export_csv(cursor, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id"] + fields)
+    async for doc in cursor:
+        row = _row(doc, fields)
+        writer.writerow([row["id"]] + ["" if row[field] is None else row[field] for field in fields])
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+@router.get("/export", dependencies=[Depends(require_admin)])
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    fields: str | None = Query(None, description="Comma-separated: username, email, bio"),
+):
+    """Stream every user as NDJSON or CSV straight off a Motor cursor (admin only)."""
+    selected = _fields(fields, EXPORT_FIELDS)
+    cursor = db.users.find({}, {field: 1 for field in selected}, batch_size=EXPORT_BATCH_SIZE).sort("_id", 1)
+    if format == "csv":
+        return StreamingResponse(_export_csv(cursor, selected), media_type="text/csv",
+                                 headers={"Content-Disposition": 'attachment; filename="users.csv"'})
+    return StreamingResponse(_export_ndjson(cursor, selected), media_type="application/x-ndjson",
+                             headers={"Content-Disposition": 'attachment; filename="users.ndjson"'})
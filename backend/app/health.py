@@ -0,0 +1,61 @@
+import asyncio
+import time
+from fastapi import APIRouter, Response, status
+import database
+from settings import settings
+
+router = APIRouter()
+
+# /readyz re-checks MongoDB at most this often; load balancer polls in between hit the cache
+READINESS_CACHE_SECONDS = settings.get_float("READINESS_CACHE_SECONDS", 2)
+READINESS_PING_TIMEOUT = settings.get_float("READINESS_PING_TIMEOUT", 1)
+
+
+# -------------------- Readiness state --------------------
+class Readiness:
+    def __init__(self):
+        # Flipped by the lifespan once startup (pool warmup, indexes) has finished
+        self.started = False
+        self._ok = False
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def mark_started(self, ok: bool = True):
+        self.started = True
+        self._ok = ok
+        self._checked_at = time.monotonic()
+
+    def mark_stopping(self):
+        self.started = False
+
+    async def check(self) -> bool:
+        if not self.started:
+            return False
+        if time.monotonic() - self._checked_at < READINESS_CACHE_SECONDS:
+            return self._ok
+        async with self._lock:
+            # Another poll may have refreshed it while we waited for the lock
+            if time.monotonic() - self._checked_at >= READINESS_CACHE_SECONDS:
+                try:
+                    self._ok = await asyncio.wait_for(database.ping(), timeout=READINESS_PING_TIMEOUT)
+                except Exception:
+                    self._ok = False
+                self._checked_at = time.monotonic()
+        return self._ok
+
+
+readiness = Readiness()
+
+# -------------------- Routes --------------------
+@router.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is up and serving. Never touches MongoDB."""
+    return {"status": "ok"}
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz(response: Response):
+    """Readiness: startup has finished and MongoDB answered a recent ping."""
+    if await readiness.check():
+        return {"status": "ready"}
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "unavailable"}
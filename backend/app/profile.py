@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional
 from bson import ObjectId
-from models import BioIn, BioOut
-from auth import get_current_user
+from pymongo import ReturnDocument
+from models import BioIn, BioOut, ProfilesRequest, ProfilesOut
+from responses import dumps, model_response, make_etag, etag_matches, not_modified, with_etag
+from auth import (
+    get_current_user,
+    get_token_claims,
+    load_user,
+    load_profile_version,
+    cache_user,
+    invalidate_user,
+    user_cache,
+)
 from database import db
+from settings import settings
 
 router = APIRouter()
 
@@ -19,51 +31,141 @@ def _user_query_id(user: dict):
         return {"_id": user["_id"]}
     return {"username": user.get("username")}
 
-# -------------------- Routes --------------------
-@router.get("/me", response_model=BioOut)
-async def get_my_profile(current_user: dict = Depends(get_current_user)):
-    """Return public profile fields (username, email, bio)."""
-    # Fetch latest from DB to ensure freshness
-    query = _user_query_id(current_user)
-    user = await db.users.find_one(query)
+# -------------------- Helper: profile reads and writes --------------------
+# Only the fields the profile routes return, plus the version behind the token check and ETags
+PROFILE_PROJECTION = {"username": 1, "email": 1, "bio": 1, "profile_version": 1, "updated_at": 1}
+
+def _bio_out(user: dict) -> BioOut:
+    return BioOut(username=user.get("username"), email=user.get("email"), bio=user.get("bio"))
+
+def _profile_etag(user_id, version) -> str:
+    return make_etag("profile", user_id, version)
+
+async def _update_profile(current_user: dict, update: dict) -> dict:
+    """Apply update and read the result back in one round trip, then refresh the user cache.
+
+    Every profile write bumps profile_version and updated_at; ETags and the
+    claims-mode token check depend on that.
+    """
+    update = {**update, "$inc": {"profile_version": 1}, "$currentDate": {"updated_at": True}}
+    user = await db.users.find_one_and_update(
+        _user_query_id(current_user),
+        update,
+        projection=PROFILE_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+    )
     if not user:
+        await invalidate_user(current_user)
         raise HTTPException(status_code=404, detail="User not found")
 
-    return BioOut(username=user.get("username"), email=user.get("email"), bio=user.get("bio"))
+    # Merge the projected fields over the cached document; dropping the old
+    # profile fields first means an $unset bio disappears from the cache too
+    fresh = {k: v for k, v in current_user.items() if k not in PROFILE_PROJECTION}
+    fresh.update(user)
+    await cache_user(fresh)
+    return user
+
+
+# -------------------- Routes --------------------
+@router.get("/me", response_model=BioOut)
+async def get_my_profile(request: Request, claims: dict = Depends(get_token_claims)):
+    """Return public profile fields (username, email, bio).
+
+    Answers If-None-Match with 304 after checking only the profile version, which
+    comes from the user cache or a two-field read, never the full document.
+    Without If-None-Match there is nothing to compare, so skip straight to the load.
+    """
+    if "if-none-match" in request.headers:
+        user_id, version = await load_profile_version(claims["sub"])
+        etag = _profile_etag(user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    # From the user cache (at most USER_CACHE_TTL old, and refreshed on every
+    # bio write) or MongoDB
+    current_user = await load_user(claims["sub"])
+    etag = _profile_etag(current_user["_id"], current_user.get("profile_version", 0))
+    return with_etag(model_response(_bio_out(current_user)), etag)
 
 @router.post("/me/bio", response_model=BioOut, status_code=status.HTTP_201_CREATED)
 async def create_bio(bio_in: BioIn, current_user: dict = Depends(get_current_user)):
     """Create or set the bio for the authenticated user. If a bio already exists it will be overwritten.
     Use POST when creating a bio for the first time; PUT is provided below for edits.
     """
-    query = _user_query_id(current_user)
     update = {"$set": {"bio": bio_in.bio}}
-    result = await db.users.update_one(query, update)
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user = await db.users.find_one(query)
-    return BioOut(username=user.get("username"), email=user.get("email"), bio=user.get("bio"))
+    user = await _update_profile(current_user, update)
+    response = model_response(_bio_out(user), status_code=status.HTTP_201_CREATED)
+    return with_etag(response, _profile_etag(user["_id"], user["profile_version"]))
 
 @router.put("/me/bio", response_model=BioOut)
 async def update_bio(bio_in: BioIn, current_user: dict = Depends(get_current_user)):
     """Edit the existing bio. This will overwrite whatever bio exists currently."""
-    query = _user_query_id(current_user)
-    result = await db.users.update_one(query, {"$set": {"bio": bio_in.bio}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user = await db.users.find_one(query)
-    return BioOut(username=user.get("username"), email=user.get("email"), bio=user.get("bio"))
+    user = await _update_profile(current_user, {"$set": {"bio": bio_in.bio}})
+    return with_etag(model_response(_bio_out(user)), _profile_etag(user["_id"], user["profile_version"]))
 
 @router.delete("/me/bio", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_bio(current_user: dict = Depends(get_current_user)):
     """Delete the bio field from the user's profile."""
-    query = _user_query_id(current_user)
-    result = await db.users.update_one(query, {"$unset": {"bio": ""}})
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="User not found")
+    await _update_profile(current_user, {"$unset": {"bio": ""}})
 
     # Return no content
     return None
 
+# -------------------- Batch profile lookup --------------------
+PROFILE_BATCH_LIMIT = settings.get_int("PROFILE_BATCH_LIMIT", 500)
+# Batches larger than this are streamed as they come off the cursor
+PROFILE_STREAM_THRESHOLD = settings.get_int("PROFILE_STREAM_THRESHOLD", 100)
+PUBLIC_PROFILE_PROJECTION = {"username": 1, "bio": 1, "_id": 0}
+
+def _requested_usernames(usernames: list[str]) -> list[str]:
+    names = list(dict.fromkeys(name.strip() for name in usernames if name.strip()))
+    if not names:
+        raise HTTPException(status_code=400, detail="No usernames given")
+    if len(names) > PROFILE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {PROFILE_BATCH_LIMIT} usernames per request")
+    return names
+
+async def _iter_profiles(names: list[str]):
+    """Yield public profiles: cache hits first, then one $in query for the rest."""
+    misses = []
+    cached_users = await user_cache.get_many([("username", name) for name in names])
+    for name, cached in zip(names, cached_users):
+        if cached is not None:
+            yield {"username": cached["username"], "bio": cached.get("bio")}
+        else:
+            misses.append(name)
+    if misses:
+        cursor = db.users.find({"username": {"$in": misses}}, PUBLIC_PROFILE_PROJECTION)
+        async for doc in cursor:
+            yield {"username": doc["username"], "bio": doc.get("bio")}
+
+async def _stream_profiles(names: list[str]):
+    found = set()
+    yield b'{"profiles":['
+    first = True
+    async for profile in _iter_profiles(names):
+        found.add(profile["username"])
+        yield (b"" if first else b",") + dumps(profile)
+        first = False
+    yield b'],"missing":' + dumps([name for name in names if name not in found]) + b"}"
+
+async def _profiles_response(usernames: list[str]):
+    names = _requested_usernames(usernames)
+    if len(names) > PROFILE_STREAM_THRESHOLD:
+        return StreamingResponse(_stream_profiles(names), media_type="application/json")
+    profiles = [profile async for profile in _iter_profiles(names)]
+    found = {profile["username"] for profile in profiles}
+    return model_response(ProfilesOut(profiles=profiles, missing=[name for name in names if name not in found]))
+
+@router.get("/profiles", response_model=ProfilesOut)
+async def get_profiles(
+    usernames: str = Query(..., description="Comma-separated usernames"),
+    claims: dict = Depends(get_token_claims),
+):
+    """Public profiles (username, bio) for up to PROFILE_BATCH_LIMIT users in one request."""
+    return await _profiles_response(usernames.split(","))
+
+@router.post("/profiles", response_model=ProfilesOut)
+async def post_profiles(body: ProfilesRequest, claims: dict = Depends(get_token_claims)):
+    """Same as GET /users/profiles, for lists too long for a query string."""
+    return await _profiles_response(body.usernames)
@@ -1,60 +1,180 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta
+import hashlib
+import time
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from database import db
-import os
+from cache import TTLCache, create_cache
+from metrics import JWT_LATENCY, timed
+from singleflight import SingleFlight
+from settings import settings
+from hashing import (
+    hash_password_async,
+    verify_password_async,
+    needs_rehash,
+)
+import logging
 
-# -------------------- Password hashing --------------------
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# -------------------- Rehash on login --------------------
+async def rehash_password(user_id, old_hash: str, plain_password: str):
+    """Re-hash a password with the current Argon2 parameters. Runs as a
+    background task after the login response has been sent."""
+    try:
+        new_hash = await hash_password_async(plain_password)
+        # Only replace the hash we verified against, in case the password changed meanwhile
+        await db.users.update_one({"_id": user_id, "password": old_hash}, {"$set": {"password": new_hash}})
+    except Exception:
+        logger.exception("Rehashing password for user %s failed", user_id)
 
 # -------------------- JWT setup --------------------
-SECRET_KEY = os.getenv("SECRET_KEY", "mysecretkey")
+SECRET_KEY = settings.get("SECRET_KEY", "mysecretkey")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# When on, access tokens also carry the user's id, email and profile version so
+# /me can be answered from the token alone
+JWT_CLAIMS_MODE = settings.get_bool("JWT_CLAIMS_MODE", False)
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    with timed(JWT_LATENCY.labels("encode")):
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims_for(user: dict) -> dict:
+    claims = {"sub": user["username"]}
+    if JWT_CLAIMS_MODE:
+        claims.update({
+            "uid": str(user["_id"]),
+            "email": user["email"],
+            "pv": user.get("profile_version", 0),
+        })
+    return claims
+
+# -------------------- User cache --------------------
+# Authenticated requests never need the password hash, so it is neither fetched nor cached
+USER_PROJECTION = {"password": 0}
+
+# Cached user documents, keyed by ("username", ...) and ("_id", ...). Writes to a
+# user document must go through cache_user() or invalidate_user(). With
+# CACHE_BACKEND=redis the cache is shared by every worker.
+USER_CACHE_SIZE = settings.get_int("USER_CACHE_SIZE", 10000)
+USER_CACHE_TTL = settings.get_float("USER_CACHE_TTL", 30)
+user_cache = create_cache("users", USER_CACHE_SIZE, USER_CACHE_TTL)
+
+def _user_keys(user: dict) -> list:
+    keys = [("username", user.get("username"))]
+    if "_id" in user:
+        keys.append(("_id", str(user["_id"])))
+    return keys
+
+async def cache_user(user: dict):
+    await user_cache.set_many({key: user for key in _user_keys(user)})
+
+async def invalidate_user(user: dict):
+    await user_cache.delete(*_user_keys(user))
+
 # -------------------- OAuth2 scheme --------------------
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
-# -------------------- Get current user --------------------
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
-    try:
+# -------------------- Verified-token cache --------------------
+# Decoded claims keyed by a digest of the token, kept until the token's own exp.
+# Always per worker: re-verifying a token elsewhere is cheaper than a network hop.
+TOKEN_CACHE_SIZE = settings.get_int("TOKEN_CACHE_SIZE", 50000)
+token_cache = TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+def decode_token(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        token_cache.delete(key)
+
+    with timed(JWT_LATENCY.labels("decode")):
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    if "exp" in payload:
+        token_cache.set(key, payload, ttl=payload["exp"] - time.time())
+    return payload
+
+# -------------------- Token claims --------------------
+async def get_token_claims(token: str = Depends(oauth2_scheme)) -> dict:
+    try:
+        payload = decode_token(token)
+    except JWTError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+async def claims_are_current(claims: dict) -> bool:
+    """True if a claims-carrying token can stand in for the user document.
+
+    The signature already proves the claims were true when the token was
+    issued. If this worker has the user cached with a newer profile version,
+    the token is stale and the caller should go to the database instead.
+    """
+    if not JWT_CLAIMS_MODE or "email" not in claims or "pv" not in claims:
+        return False
+    cached = await user_cache.get(("username", claims["sub"]))
+    return cached is None or cached.get("profile_version", 0) == claims["pv"]
+
+# -------------------- Get current user --------------------
+# Concurrent requests for the same user on this worker share one Mongo query
+user_lookups = SingleFlight("user_lookup")
+
+async def load_user(username: str) -> dict:
+    # Serve from the cache, falling back to MongoDB
+    user = await user_cache.get(("username", username))
+    if user is None:
+        user = await user_lookups.do(
+            ("user", username), lambda: db.users.find_one({"username": username}, USER_PROJECTION)
+        )
+        if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
+                detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
+        await cache_user(user)
+    return user
 
-        # Fetch user from MongoDB
-        user = await db.users.find_one({"username": username})
+async def load_profile_version(username: str) -> tuple[str, int]:
+    """(_id, profile_version) for a conditional GET: from the user cache if
+    present, otherwise a read projected to just those two fields."""
+    user = await user_cache.get(("username", username))
+    if user is None:
+        user = await user_lookups.do(
+            ("version", username), lambda: db.users.find_one({"username": username}, {"profile_version": 1})
+        )
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="User not found",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return user
+    return str(user["_id"]), user.get("profile_version", 0)
 
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+async def get_current_user(claims: dict = Depends(get_token_claims)) -> dict:
+    return await load_user(claims["sub"])
+
+# -------------------- Admin access --------------------
+# Comma-separated usernames allowed to use the /admin routes
+ADMIN_USERNAMES = set(settings.get_list("ADMIN_USERNAMES"))
+
+async def require_admin(claims: dict = Depends(get_token_claims)) -> dict:
+    if claims["sub"] not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return claims
@@ -0,0 +1,75 @@
+"""Cold-start cost of importing the app module.
+
+Each run imports main in a fresh interpreter under `python -X importtime`, which
+is what every uvicorn worker pays before it can serve. Reports the median
+cumulative import time of main and the packages that contribute most to it.
+
+    python benchmarks/bench_import.py --runs 10
+    python benchmarks/bench_import.py --max-ms 400   # exit 1 if the median is slower
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import made by one cold `import module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark for the app module")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-ms", type=float, help="Fail if the median import is slower than this")
+    args = parser.parse_args()
+
+    totals = []
+    by_package = defaultdict(list)
+    for _ in range(args.runs):
+        rows = import_times(args.module)
+        totals.append(next(cumulative for name, _, cumulative in rows if name == args.module))
+        package_self = defaultdict(int)
+        for name, self_us, _ in rows:
+            package_self[name.split(".")[0]] += self_us
+        for package, self_us in package_self.items():
+            by_package[package].append(self_us)
+
+    median_ms = statistics.median(totals) / 1000
+    top = sorted(by_package.items(), key=lambda item: statistics.median(item[1]), reverse=True)[:args.top]
+    print(json.dumps({
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(totals) / 1000, 1),
+        "max_ms": round(max(totals) / 1000, 1),
+        "top_packages_ms": {package: round(statistics.median(times) / 1000, 1) for package, times in top},
+    }, indent=2))
+    if args.max_ms is not None and median_ms > args.max_ms:
+        sys.exit(f"median import time {median_ms:.1f} ms exceeds {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
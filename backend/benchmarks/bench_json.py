@@ -0,0 +1,61 @@
+"""Per-request serialization CPU: FastAPI's default path vs. model_response.
+
+The default path for a handler that returns a model with response_model set is
+re-validation against the response model, jsonable_encoder, then stdlib json.
+model_response() skips the first two and encodes with orjson/msgspec when
+installed. Payloads mirror /me (UserOut) and /users/me plus the bio routes (BioOut).
+
+    python benchmarks/bench_json.py --iterations 200000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from models import BioOut, UserOut  # noqa: E402
+import responses  # noqa: E402
+
+PAYLOADS = {
+    "/me": UserOut(username="alice", email="alice@example.com"),
+    "/users/me": BioOut(username="alice", email="alice@example.com", bio="Hello! " * 40),
+    "/users/me/bio": BioOut(username="alice", email="alice@example.com", bio="Updated bio " * 20),
+}
+
+
+def default_path(model):
+    # What FastAPI does with a returned model: validate against response_model,
+    # run jsonable_encoder, then render with the stdlib encoder
+    validated = type(model).model_validate(model.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_path(model):
+    return responses.model_response(model).body
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON response microbenchmark")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    encoder = "orjson" if responses.orjson else "msgspec" if responses.msgspec else "stdlib"
+    results = {"encoder": encoder, "routes": {}}
+    for route, model in PAYLOADS.items():
+        assert json.loads(default_path(model)) == json.loads(fast_path(model))
+        default = timeit.timeit(lambda: default_path(model), number=args.iterations)
+        fast = timeit.timeit(lambda: fast_path(model), number=args.iterations)
+        results["routes"][route] = {
+            "default_us": round(default / args.iterations * 1e6, 2),
+            "fast_us": round(fast / args.iterations * 1e6, 2),
+            "saved_us_per_request": round((default - fast) / args.iterations * 1e6, 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Measure /users/me latency while /login is under load.
+
+Run against a live server with an existing account:
+
+    python benchmarks/bench_login_load.py --base-url http://localhost:8000 \
+        --username alice --password secret
+
+Start the server with RATE_LIMIT_ENABLED=false: the login burst comes from one
+address and would otherwise be answered with 429s after the first few requests.
+
+With Argon2 on the event loop, the p99 of /users/me jumps as soon as the login
+burst starts. With the process-pool hashing service it should stay flat.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def login(client, username, password):
+    resp = await client.post("/login", data={"username": username, "password": password})
+    resp.raise_for_status()
+    return resp.json()["access_token"]
+
+
+async def read_me(client, token, duration, samples):
+    headers = {"Authorization": f"Bearer {token}"}
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await client.get("/users/me", headers=headers)
+        samples.append((time.perf_counter() - start) * 1000)
+
+
+async def login_storm(client, username, password, duration):
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        await client.post("/login", data={"username": username, "password": password})
+
+
+async def run_phase(base_url, token, username, password, duration, readers, loginers):
+    samples = []
+    limits = httpx.Limits(max_connections=readers + loginers)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        tasks = [read_me(client, token, duration, samples) for _ in range(readers)]
+        tasks += [login_storm(client, username, password, duration) for _ in range(loginers)]
+        await asyncio.gather(*tasks)
+    return {
+        "requests": len(samples),
+        "p50_ms": round(statistics.median(samples), 2) if samples else 0.0,
+        "p99_ms": round(percentile(samples, 99), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--loginers", type=int, default=16)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(base_url=args.base_url) as client:
+        token = await login(client, args.username, args.password)
+
+    idle = await run_phase(args.base_url, token, args.username, args.password,
+                           args.duration, args.readers, 0)
+    loaded = await run_phase(args.base_url, token, args.username, args.password,
+                             args.duration, args.readers, args.loginers)
+    print(json.dumps({"users_me_idle": idle, "users_me_under_login_load": loaded}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+"""Throughput of the old launch command vs. serve.py on the same host.
+
+Starts each server in turn, drives GET /healthz (no database work, so the
+numbers reflect the server stack itself) from several client processes, and
+prints RPS and latency percentiles for both. The app still needs MongoDB to
+finish startup, so set MONGO_URL first.
+
+    python benchmarks/bench_server.py --duration 15 --clients 4 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODES = {
+    "old_reload_single": [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", "{port}",
+                          "--reload"],
+    "serve_py": [sys.executable, "serve.py"],
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def _drive(url, duration, concurrency):
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=10) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(url)
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(url, duration, concurrency, queue):
+    queue.put(asyncio.run(_drive(url, duration, concurrency)))
+
+
+def wait_ready(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def bench_mode(name, port, args):
+    cmd = [part.format(port=port) for part in MODES[name]]
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1")
+    server = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}/healthz"
+    try:
+        wait_ready(url)
+        queue = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client_process,
+                                           args=(url, args.duration, args.concurrency, queue))
+                   for _ in range(args.clients)]
+        for proc in clients:
+            proc.start()
+        latencies, errors = [], 0
+        for _ in clients:
+            samples, failed = queue.get()
+            latencies += samples
+            errors += failed
+        for proc in clients:
+            proc.join()
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / args.duration, 1),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare server launch modes")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--clients", type=int, default=4, help="load generator processes")
+    parser.add_argument("--concurrency", type=int, default=32, help="connections per client process")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    results = {name: bench_mode(name, args.port + i, args) for i, name in enumerate(MODES)}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
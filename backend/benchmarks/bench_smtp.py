@@ -0,0 +1,77 @@
+"""OTP email throughput: pooled SMTP connections vs. one connection per message.
+
+Runs against the local SMTP sink by default, so it needs no credentials:
+
+    python benchmarks/bench_smtp.py --messages 5000 --pool-size 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import smtplib
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email_utils import SMTPPool, build_otp_message  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+
+def send_unpooled(host, port, msg):
+    # What send_otp_email used to do: dial, greet and authenticate per message
+    with smtplib.SMTP(host, port) as server:
+        server.send_message(msg)
+
+
+async def run_unpooled(host, port, messages, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with slots:
+            msg = build_otp_message(f"user{i}@example.com", f"{i % 1000000:06d}")
+            await asyncio.to_thread(send_unpooled, host, port, msg)
+
+    await asyncio.gather(*(one(i) for i in range(messages)))
+
+
+async def run_pooled(pool, messages):
+    await asyncio.gather(*(
+        pool.send(build_otp_message(f"user{i}@example.com", f"{i % 1000000:06d}"))
+        for i in range(messages)
+    ))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="OTP email throughput benchmark")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--skip-unpooled", action="store_true")
+    args = parser.parse_args()
+
+    results = {}
+    async with SMTPSink() as sink:
+        if not args.skip_unpooled:
+            start = time.perf_counter()
+            await run_unpooled(sink.host, sink.port, args.messages, args.pool_size)
+            elapsed = time.perf_counter() - start
+            results["unpooled"] = {"seconds": round(elapsed, 3),
+                                   "msgs_per_sec": round(args.messages / elapsed, 1)}
+
+        before = sink.connections
+        pool = SMTPPool(sink.host, sink.port, username=None, password=None,
+                        starttls=False, size=args.pool_size)
+        start = time.perf_counter()
+        await run_pooled(pool, args.messages)
+        elapsed = time.perf_counter() - start
+        await asyncio.to_thread(pool.close)
+        results["pooled"] = {"seconds": round(elapsed, 3),
+                             "msgs_per_sec": round(args.messages / elapsed, 1),
+                             "connections_opened": sink.connections - before}
+        results["received"] = sink.received
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""JWT verification cost with and without the verified-token cache.
+
+Simulates a population of clients that each reuse their bearer token a number
+of times, and reports the average per-request cost of turning the token into
+claims.
+
+    python benchmarks/bench_token_cache.py --requests 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jose import jwt  # noqa: E402
+import auth  # noqa: E402
+
+
+def make_tokens(count):
+    return [auth.create_access_token({"sub": f"user{i}"}) for i in range(count)]
+
+
+def request_stream(tokens, reuse, total):
+    # Each token is presented `reuse` times on average, interleaved across clients
+    stream = [tokens[i % len(tokens)] for i in range(total)]
+    random.shuffle(stream)
+    return stream
+
+
+def run_uncached(stream):
+    start = time.perf_counter()
+    for token in stream:
+        jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    return time.perf_counter() - start
+
+
+def run_cached(stream):
+    auth.token_cache.clear()
+    start = time.perf_counter()
+    for token in stream:
+        auth.decode_token(token)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token cache microbenchmark")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--reuse", type=int, nargs="+", default=[1, 10, 100, 500])
+    args = parser.parse_args()
+
+    results = []
+    for reuse in args.reuse:
+        tokens = make_tokens(max(1, args.requests // reuse))
+        stream = request_stream(tokens, reuse, args.requests)
+        uncached = run_uncached(stream)
+        cached = run_cached(stream)
+        results.append({
+            "reuse_per_token": reuse,
+            "uncached_us_per_request": round(uncached / args.requests * 1e6, 2),
+            "cached_us_per_request": round(cached / args.requests * 1e6, 2),
+            "speedup": round(uncached / cached, 1),
+            "cache": auth.token_cache.stats(),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
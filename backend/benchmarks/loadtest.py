@@ -0,0 +1,262 @@
+"""End-to-end load test for the auth API.
+
+Scenarios:
+    signup_storm   POST /signup-request with fresh emails
+    login_storm    POST /login for seeded users
+    me_read_heavy  90% GET /users/me, 10% GET /me
+    bio_write_mix  70% GET /users/me, 20% PUT /users/me/bio, 5% POST, 5% DELETE
+
+By default the app runs in-process behind httpx's ASGI transport, with OTP
+mail going to a local SMTP sink. Pass --base-url to hit a running server
+instead. Either way the scenarios seed users through MONGO_URL, into a scratch
+database (MONGO_DB_NAME, default "loadtest_user_auth_db") unless told otherwise.
+
+Every simulated client comes from one address, so the in-process app runs
+with RATE_LIMIT_ENABLED=false (set it yourself to test the limiter). With
+--base-url, start the server with RATE_LIMIT_ENABLED=false, or with limits
+high enough for the run; otherwise the storms only measure 429s.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/loadtest.py \\
+        --scenarios login_storm me_read_heavy --duration 20 --concurrency 64 \\
+        --output results.json
+
+Results are JSON (RPS, p50/p95/p99 latency in ms, error rate per scenario and
+per operation) so runs can be diffed between commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGO_DB_NAME", "loadtest_user_auth_db")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+import httpx  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+USER_PREFIX = "lt_user"
+PASSWORD = "loadtest-password"
+
+
+# -------------------- Stats --------------------
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, errors, elapsed):
+    total = len(latencies)
+    return {
+        "requests": total,
+        "rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def timed(self, op, request):
+        start = time.perf_counter()
+        try:
+            resp = await request
+            failed = resp.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        self.latencies[op].append((time.perf_counter() - start) * 1000)
+        if failed:
+            self.errors[op] += 1
+
+    def report(self, elapsed):
+        every = [ms for samples in self.latencies.values() for ms in samples]
+        result = summarize(every, sum(self.errors.values()), elapsed)
+        result["by_op"] = {op: summarize(samples, self.errors[op], elapsed)
+                           for op, samples in sorted(self.latencies.items())}
+        return result
+
+
+# -------------------- Setup --------------------
+async def seed_users(count):
+    """Insert `count` verified users directly, sharing one password hash."""
+    from database import db
+    from hashing import hash_password
+
+    await db.users.delete_many({"username": {"$regex": f"^{USER_PREFIX}"}})
+    hashed = hash_password(PASSWORD)
+    await db.users.insert_many([
+        {"username": f"{USER_PREFIX}{i}", "email": f"{USER_PREFIX}{i}@example.com", "password": hashed}
+        for i in range(count)
+    ])
+    return [f"{USER_PREFIX}{i}" for i in range(count)]
+
+
+async def login_all(client, usernames, concurrency=8):
+    slots = asyncio.Semaphore(concurrency)
+    tokens = {}
+
+    async def one(username):
+        async with slots:
+            resp = await client.post("/login", data={"username": username, "password": PASSWORD})
+            resp.raise_for_status()
+            tokens[username] = resp.json()["access_token"]
+
+    await asyncio.gather(*(one(u) for u in usernames))
+    return tokens
+
+
+# -------------------- Scenarios --------------------
+def signup_storm(client, ctx):
+    run = ctx["run_id"]
+    counter = iter(range(10**9))
+
+    def op():
+        i = next(counter)
+        body = {"username": f"lt_signup_{run}_{i}", "email": f"lt_signup_{run}_{i}@example.com",
+                "password": PASSWORD}
+        return "signup_request", client.post("/signup-request", json=body)
+    return op
+
+
+def login_storm(client, ctx):
+    usernames = ctx["usernames"]
+
+    def op():
+        username = random.choice(usernames)
+        return "login", client.post("/login", data={"username": username, "password": PASSWORD})
+    return op
+
+
+def me_read_heavy(client, ctx):
+    tokens = list(ctx["tokens"].values())
+
+    def op():
+        headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+        if random.random() < 0.9:
+            return "get_users_me", client.get("/users/me", headers=headers)
+        return "get_me", client.get("/me", headers=headers)
+    return op
+
+
+def bio_write_mix(client, ctx):
+    tokens = list(ctx["tokens"].values())
+
+    def op():
+        headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+        roll = random.random()
+        if roll < 0.7:
+            return "get_users_me", client.get("/users/me", headers=headers)
+        bio = {"bio": f"bio {uuid.uuid4().hex}"}
+        if roll < 0.9:
+            return "put_bio", client.put("/users/me/bio", json=bio, headers=headers)
+        if roll < 0.95:
+            return "post_bio", client.post("/users/me/bio", json=bio, headers=headers)
+        return "delete_bio", client.delete("/users/me/bio", headers=headers)
+    return op
+
+
+SCENARIOS = {
+    "signup_storm": signup_storm,
+    "login_storm": login_storm,
+    "me_read_heavy": me_read_heavy,
+    "bio_write_mix": bio_write_mix,
+}
+
+
+async def run_scenario(client, name, ctx, duration, concurrency):
+    next_op = SCENARIOS[name](client, ctx)
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            op, request = next_op()
+            await recorder.timed(op, request)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return recorder.report(time.perf_counter() - start)
+
+
+# -------------------- Driver --------------------
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {"revision": git_revision(), "mode": "http" if args.base_url else "asgi",
+               "duration": args.duration, "concurrency": args.concurrency, "scenarios": {}}
+
+    async def run_all(client):
+        usernames = await seed_users(args.users)
+        ctx = {"run_id": uuid.uuid4().hex[:8], "usernames": usernames}
+        if {"me_read_heavy", "bio_write_mix"} & set(args.scenarios):
+            ctx["tokens"] = await login_all(client, usernames)
+        for name in args.scenarios:
+            results["scenarios"][name] = await run_scenario(client, name, ctx, args.duration, args.concurrency)
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+            await run_all(client)
+        return results
+
+    # In-process: start the sink first so the app's mail settings point at it
+    async with SMTPSink() as sink:
+        os.environ.update({"SMTP_SERVER": sink.host, "SMTP_PORT": str(sink.port), "SMTP_STARTTLS": "false",
+                           "SENDER_EMAIL": os.getenv("SENDER_EMAIL", "loadtest@example.com"),
+                           "SENDER_PASSWORD": os.getenv("SENDER_PASSWORD", "loadtest")})
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", limits=limits,
+                                         timeout=30) as client:
+                await run_all(client)
+        results["emails_received"] = sink.received
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the auth API")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50, help="seeded users for login/read/write scenarios")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report = json.dumps(results, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
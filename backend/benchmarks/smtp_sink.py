@@ -0,0 +1,106 @@
+"""A local SMTP server that accepts every message and throws it away.
+
+Point the app at it with SMTP_SERVER=127.0.0.1 SMTP_PORT=<port> SMTP_STARTTLS=false.
+
+    python benchmarks/smtp_sink.py --port 1025
+"""
+import argparse
+import asyncio
+from collections import deque
+
+
+class SMTPSink:
+    """Speaks just enough ESMTP for smtplib: EHLO, AUTH PLAIN, MAIL/RCPT/DATA, NOOP, RSET, QUIT."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, keep: int = 100):
+        self.host = host
+        self.port = port
+        self.received = 0
+        self.connections = 0
+        self.messages: deque[tuple[str, list[str], bytes]] = deque(maxlen=keep)
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        mail_from, rcpt_to = "", []
+
+        def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+
+        reply("220 smtp-sink ESMTP")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                verb = line.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    reply("250-smtp-sink")
+                    reply("250-AUTH PLAIN")
+                    reply("250 8BITMIME")
+                elif verb == "AUTH":
+                    reply("235 2.7.0 Authentication successful")
+                elif verb == "MAIL":
+                    mail_from, rcpt_to = line[10:].strip("<> "), []
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    rcpt_to.append(line[8:].strip("<> "))
+                    reply("250 OK")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    body = bytearray()
+                    while True:
+                        chunk = await reader.readline()
+                        if not chunk or chunk in (b".\r\n", b".\n"):
+                            break
+                        body += chunk
+                    self.received += 1
+                    self.messages.append((mail_from, rcpt_to, bytes(body)))
+                    reply("250 OK queued")
+                elif verb in ("NOOP", "RSET"):
+                    reply("250 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    async with SMTPSink(args.host, args.port) as sink:
+        print(f"SMTP sink listening on {sink.host}:{sink.port}")
+        await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
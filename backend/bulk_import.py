@@ -0,0 +1,259 @@
+"""Bulk user provisioning from CSV or NDJSON.
+
+Rows need username, email and password. They are read as a stream, validated,
+deduplicated (within the input and against existing users), hashed in parallel
+on the Argon2 process pool, and written with unordered insert_many in batches.
+
+    python bulk_import.py users.csv
+    python bulk_import.py users.ndjson --format ndjson --batch-size 2000
+
+The same importer backs POST /admin/users/import.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import sys
+import time
+from collections import deque
+from typing import AsyncIterator, Iterable
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from database import db
+from hashing import hashing_service
+from models import UserCreate
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+BULK_BATCH_SIZE = settings.get_int("BULK_BATCH_SIZE", 1000)
+# Per-row errors kept in the report; the counts are always complete
+MAX_REPORTED_ERRORS = 1000
+
+
+# -------------------- Input parsing --------------------
+async def parse_rows(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """Yield (row number, fields, parse error) for each record in the stream."""
+    if fmt == "csv":
+        # One reader over the whole stream, so quoted fields may span lines. It
+        # is only advanced once the buffered lines close every quote they open,
+        # i.e. hold whole records; a doubled "" inside a field counts twice.
+        pending = _PendingLines()
+        reader = csv.reader(pending)
+        in_quotes = False
+        header = None
+        row_number = 0
+        async for line in lines:
+            if not in_quotes and not line.strip():
+                continue
+            pending.append(line + "\n")
+            in_quotes ^= line.count('"') % 2 == 1
+            if in_quotes:
+                continue
+            while pending:
+                values = next(reader)
+                if header is None:
+                    header = [name.strip().lower() for name in values]
+                    continue
+                row_number += 1
+                if len(values) != len(header):
+                    yield row_number, None, f"expected {len(header)} columns, got {len(values)}"
+                    continue
+                yield row_number, dict(zip(header, values)), None
+        if in_quotes and header is not None:
+            yield row_number + 1, None, "unterminated quoted field"
+    elif fmt == "ndjson":
+        row_number = 0
+        async for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield row_number, None, "expected a JSON object"
+                continue
+            yield row_number, record, None
+    else:
+        raise ValueError(f"unsupported format: {fmt}")
+
+
+class _PendingLines:
+    """Lines received but not yet parsed, as an iterator for csv.reader."""
+
+    def __init__(self):
+        self._lines: deque[str] = deque()
+
+    def append(self, line: str):
+        self._lines.append(line)
+
+    def __bool__(self) -> bool:
+        return bool(self._lines)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
+
+
+async def lines_from_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Split a byte stream (e.g. a request body) into text lines without buffering it whole."""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *complete, pending = pending.split(b"\n")
+        for line in complete:
+            yield line.decode("utf-8").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8").rstrip("\r")
+
+
+async def lines_from_file(lines: Iterable[str]) -> AsyncIterator[str]:
+    for line in lines:
+        yield line.rstrip("\r\n")
+
+
+# -------------------- Import --------------------
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors: list[dict] = []
+        self._start = time.perf_counter()
+
+    def error(self, row: int, message: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = time.perf_counter() - self._start
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "errors": self.errors,
+        }
+
+
+class UserImporter:
+    def __init__(self, batch_size: int = BULK_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.report = ImportReport()
+        # Usernames/emails already taken by earlier rows of this import
+        self._seen_usernames: set[str] = set()
+        self._seen_emails: set[str] = set()
+
+    async def run(self, rows: AsyncIterator[tuple[int, dict | None, str | None]]) -> dict:
+        batch: list[tuple[int, UserCreate]] = []
+        async for row_number, fields, parse_error in rows:
+            self.report.rows += 1
+            if parse_error:
+                self.report.error(row_number, parse_error)
+                continue
+            try:
+                user = UserCreate(**{k: fields.get(k) for k in ("username", "email", "password")})
+            except ValidationError as e:
+                first = e.errors()[0]
+                self.report.error(row_number, f"{'.'.join(map(str, first['loc']))}: {first['msg']}")
+                continue
+            if user.username in self._seen_usernames or user.email in self._seen_emails:
+                self.report.error(row_number, "duplicate username or email earlier in the input", duplicate=True)
+                continue
+            self._seen_usernames.add(user.username)
+            self._seen_emails.add(user.email)
+            batch.append((row_number, user))
+            if len(batch) >= self.batch_size:
+                await self._write_batch(batch)
+                batch = []
+        if batch:
+            await self._write_batch(batch)
+        return self.report.as_dict()
+
+    async def _write_batch(self, batch: list[tuple[int, UserCreate]]):
+        # One query finds every row that clashes with an existing account
+        existing = db.users.find(
+            {"$or": [
+                {"username": {"$in": [user.username for _, user in batch]}},
+                {"email": {"$in": [user.email for _, user in batch]}},
+            ]},
+            projection={"username": 1, "email": 1, "_id": 0},
+        )
+        taken_usernames, taken_emails = set(), set()
+        async for doc in existing:
+            taken_usernames.add(doc.get("username"))
+            taken_emails.add(doc.get("email"))
+
+        fresh = []
+        for row_number, user in batch:
+            if user.username in taken_usernames:
+                self.report.error(row_number, "username already exists", duplicate=True)
+            elif user.email in taken_emails:
+                self.report.error(row_number, "email already exists", duplicate=True)
+            else:
+                fresh.append((row_number, user))
+        if not fresh:
+            return
+
+        hashes = await hashing_service.hash_many([user.password for _, user in fresh])
+        documents = [
+            {"username": user.username, "email": user.email, "password": hashed}
+            for (_, user), hashed in zip(fresh, hashes)
+        ]
+        try:
+            result = await db.users.insert_many(documents, ordered=False)
+            self.report.inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Unordered: everything except the failed rows was written
+            details = e.details
+            self.report.inserted += details.get("nInserted", 0)
+            for write_error in details.get("writeErrors", []):
+                row_number = fresh[write_error["index"]][0]
+                duplicate = write_error.get("code") == 11000
+                self.report.error(row_number, "username or email already exists" if duplicate
+                                  else write_error.get("errmsg", "write failed"), duplicate=duplicate)
+
+
+async def import_users(lines: AsyncIterator[str], fmt: str, batch_size: int = BULK_BATCH_SIZE) -> dict:
+    return await UserImporter(batch_size).run(parse_rows(lines, fmt))
+
+
+# -------------------- CLI --------------------
+async def _main(args) -> dict:
+    hashing_service.start()
+    try:
+        with open(args.path, newline="", encoding="utf-8") as f:
+            return await import_users(lines_from_file(f), args.format, args.batch_size)
+    finally:
+        await asyncio.to_thread(hashing_service.shutdown)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-create users from CSV or NDJSON")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+    args = parser.parse_args()
+    if args.format is None:
+        args.format = "ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv"
+
+    logging.basicConfig(level=logging.INFO)
+    report = asyncio.run(_main(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    sys.exit(1 if report["invalid"] else 0)
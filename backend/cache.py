@@ -0,0 +1,308 @@
+import asyncio
+from abc import ABC, abstractmethod
+import logging
+import time
+import uuid
+from collections import OrderedDict
+import bson
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# "memory" keeps cached entries per worker; "redis" shares them across workers and replicas
+CACHE_BACKEND = settings.get("CACHE_BACKEND", "memory")
+REDIS_URL = settings.get("REDIS_URL", "redis://localhost:6379/0")
+# The redis backend keeps a small per-worker copy of hot entries, dropped on pub/sub invalidation
+CACHE_NEAR_SIZE = settings.get_int("CACHE_NEAR_SIZE", 1000)
+CACHE_NEAR_TTL = settings.get_float("CACHE_NEAR_TTL", 5)
+
+
+# -------------------- LRU + TTL cache --------------------
+class TTLCache:
+    """Bounded in-process cache: least recently used entries are evicted once
+    maxsize is reached, and every entry expires after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float | None = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# -------------------- Cache backends --------------------
+# Async interface shared by the in-process and Redis caches. Keys are tuples
+# such as ("username", "alice"); values must be BSON-encodable for Redis.
+class CacheBackend(ABC):
+    async def get(self, key, default=None):
+        value = (await self.get_many([key]))[0]
+        return default if value is None else value
+
+    @abstractmethod
+    async def get_many(self, keys: list) -> list:
+        """Values for keys, in order; None for misses."""
+
+    async def set(self, key, value, ttl: float | None = None):
+        await self.set_many({key: value}, ttl)
+
+    @abstractmethod
+    async def set_many(self, items: dict, ttl: float | None = None):
+        """Store every item; ttl defaults to the cache's own."""
+
+    @abstractmethod
+    async def delete(self, *keys):
+        pass
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    @abstractmethod
+    def stats(self) -> dict:
+        pass
+
+
+class LocalCache(CacheBackend):
+    """Per-process TTLCache behind the async interface."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize, ttl)
+
+    async def get_many(self, keys: list) -> list:
+        return [self._cache.get(key) for key in keys]
+
+    async def set_many(self, items: dict, ttl: float | None = None):
+        for key, value in items.items():
+            self._cache.set(key, value, ttl)
+
+    async def delete(self, *keys):
+        for key in keys:
+            self._cache.delete(key)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker through Redis.
+
+    Multi-key reads are one MGET and writes are pipelined with their
+    invalidation message. Each worker also keeps a short-lived near cache;
+    writes and deletes are published on a channel so the other workers drop
+    their copies. If the subscription drops, the near cache is cleared, since
+    invalidations may have been missed meanwhile.
+
+    Pass client= to run against any redis.asyncio-compatible client, e.g.
+    fakeredis.aioredis.FakeRedis() in tests.
+    """
+
+    def __init__(self, namespace: str, ttl: float, client=None,
+                 near_size: int = CACHE_NEAR_SIZE, near_ttl: float = CACHE_NEAR_TTL):
+        self.namespace = namespace
+        self.ttl = ttl
+        self._client = client
+        self._near = TTLCache(near_size, near_ttl) if near_size > 0 and near_ttl > 0 else None
+        self._channel = f"{namespace}:invalidate"
+        # Lets a worker ignore its own invalidation messages
+        self._origin = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+        self._pubsub = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = redis_client()
+        return self._client
+
+    def _key(self, key) -> str:
+        parts = key if isinstance(key, tuple) else (key,)
+        return ":".join([self.namespace, *(part.hex() if isinstance(part, bytes) else str(part) for part in parts)])
+
+    async def get_many(self, keys: list) -> list:
+        redis_keys = [self._key(key) for key in keys]
+        values = [self._near.get(rk) if self._near is not None else None for rk in redis_keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            raw = await self.client.mget([redis_keys[i] for i in missing])
+            for i, data in zip(missing, raw):
+                if data is None:
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                values[i] = bson.decode(data)["v"]
+                if self._near is not None:
+                    self._near.set(redis_keys[i], values[i])
+        return values
+
+    async def set_many(self, items: dict, ttl: float | None = None):
+        ttl_ms = max(1, int((self.ttl if ttl is None else ttl) * 1000))
+        redis_keys = {self._key(key): value for key, value in items.items()}
+        async with self.client.pipeline(transaction=False) as pipe:
+            for rk, value in redis_keys.items():
+                pipe.set(rk, bson.encode({"v": value}), px=ttl_ms)
+            pipe.publish(self._channel, self._message(redis_keys))
+            await pipe.execute()
+        if self._near is not None:
+            for rk, value in redis_keys.items():
+                self._near.set(rk, value)
+
+    async def delete(self, *keys):
+        redis_keys = [self._key(key) for key in keys]
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*redis_keys)
+            pipe.publish(self._channel, self._message(redis_keys))
+            await pipe.execute()
+        if self._near is not None:
+            for rk in redis_keys:
+                self._near.delete(rk)
+
+    def _message(self, redis_keys) -> bytes:
+        return bson.encode({"origin": self._origin, "keys": list(redis_keys)})
+
+    # -------------------- Invalidation --------------------
+    async def start(self):
+        if self._near is not None and self._listener is None:
+            ready = asyncio.Event()
+            self._listener = asyncio.create_task(self._listen(ready))
+            await ready.wait()
+
+    async def _listen(self, ready: asyncio.Event):
+        while True:
+            try:
+                self._pubsub = pubsub = self.client.pubsub()
+                try:
+                    await pubsub.subscribe(self._channel)
+                    ready.set()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._invalidate(bson.decode(message["data"]))
+                        elif message["type"] == "subscribe":
+                            # Also sent when redis-py reconnects and resubscribes on its
+                            # own; invalidations may have been missed in between
+                            self._near.clear()
+                finally:
+                    self._pubsub = None
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Cache invalidation channel %s lost; retrying", self._channel, exc_info=True)
+                ready.set()
+            self._near.clear()
+            await asyncio.sleep(1)
+
+    def _invalidate(self, message: dict):
+        if message["origin"] == self._origin:
+            return
+        for rk in message["keys"]:
+            self._near.delete(rk)
+        self.invalidations += 1
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "near": self._near.stats() if self._near is not None else None,
+        }
+
+
+# -------------------- Factory --------------------
+_redis_client = None
+_caches: list[CacheBackend] = []
+
+def redis_client():
+    global _redis_client
+    if _redis_client is None:
+        # Imported here so the default in-process backend never pays for it
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package")
+        _redis_client = aioredis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+def create_cache(namespace: str, maxsize: int, ttl: float) -> CacheBackend:
+    """The configured cache backend; maxsize only bounds the in-process one."""
+    if CACHE_BACKEND == "redis":
+        cache = RedisCache(namespace, ttl)
+    elif CACHE_BACKEND == "memory":
+        cache = LocalCache(maxsize, ttl)
+    else:
+        raise ValueError(f"unknown CACHE_BACKEND: {CACHE_BACKEND}")
+    _caches.append(cache)
+    return cache
+
+async def start_caches():
+    for cache in _caches:
+        await cache.start()
+
+async def close_caches():
+    global _redis_client
+    for cache in _caches:
+        await cache.close()
+    if _redis_client is not None:
+        await _redis_client.aclose()
+        _redis_client = None
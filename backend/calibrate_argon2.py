@@ -0,0 +1,77 @@
+"""Pick Argon2 parameters for this host.
+
+Measures verify time on the current machine and prints the strongest settings
+that stay within a target verify time and memory budget:
+
+    python calibrate_argon2.py --target-ms 150 --memory-budget-mib 512 --workers 4
+
+The memory budget is shared by the hashing pool, so each hash gets
+budget / workers. Put the printed ARGON2_* lines in .env; on their next login,
+users with older hashes are transparently rehashed to the new parameters.
+"""
+import argparse
+import os
+import statistics
+import time
+from passlib.hash import argon2
+from settings import settings
+
+SAMPLE_PASSWORD = "calibration-password"
+
+
+def verify_ms(time_cost: int, memory_cost: int, parallelism: int, rounds: int) -> float:
+    hasher = argon2.using(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    hashed = hasher.hash(SAMPLE_PASSWORD)
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.verify(SAMPLE_PASSWORD, hashed)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def calibrate(target_ms: float, memory_kib: int, parallelism: int, rounds: int, max_time_cost: int = 20):
+    # Memory is the stronger defence, so spend the budget first; if even one
+    # pass over that much memory is too slow, halve it until it fits
+    while memory_kib > 8 * parallelism:
+        elapsed = verify_ms(1, memory_kib, parallelism, rounds)
+        print(f"  t=1 m={memory_kib // 1024}MiB p={parallelism}: {elapsed:.1f}ms")
+        if elapsed <= target_ms:
+            break
+        memory_kib //= 2
+
+    # Then add passes while we stay under the target
+    time_cost = 1
+    while time_cost < max_time_cost:
+        elapsed = verify_ms(time_cost + 1, memory_kib, parallelism, rounds)
+        print(f"  t={time_cost + 1} m={memory_kib // 1024}MiB p={parallelism}: {elapsed:.1f}ms")
+        if elapsed > target_ms:
+            break
+        time_cost += 1
+    return time_cost, memory_kib, verify_ms(time_cost, memory_kib, parallelism, rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate Argon2 cost parameters for this host")
+    parser.add_argument("--target-ms", type=float, default=100.0, help="target median verify time")
+    parser.add_argument("--memory-budget-mib", type=int, default=256,
+                        help="memory available to all concurrent hashes together")
+    parser.add_argument("--workers", type=int, default=settings.get_int("HASH_POOL_WORKERS", os.cpu_count() or 1),
+                        help="hashing pool size (concurrent hashes)")
+    parser.add_argument("--parallelism", type=int, default=1,
+                        help="lanes per hash; keep at 1 when the pool already uses every core")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    memory_kib = args.memory_budget_mib * 1024 // max(1, args.workers)
+    print(f"Calibrating for {args.target_ms:.0f}ms verify, {memory_kib // 1024}MiB per hash "
+          f"({args.workers} concurrent)")
+    time_cost, memory_kib, elapsed = calibrate(args.target_ms, memory_kib, args.parallelism, args.rounds)
+    print(f"\nMedian verify: {elapsed:.1f}ms\n")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_kib}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,92 @@
-import os
-from dotenv import load_dotenv
+import asyncio
 import motor.motor_asyncio
-
-# Load environment variables from .env file
-load_dotenv()
+from monitoring import CommandMetricsListener, PoolMetricsListener
+from settings import settings
 
 #Use the MongoDB container hostname ("mongo")
-MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-
-# Create MongoDB client
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+MONGO_URL = settings.get("MONGO_URL", "mongodb://mongo:27017")
 
 # Define database name
-db = client.user_auth_db
+MONGO_DB_NAME = settings.get("MONGO_DB_NAME", "user_auth_db")
+
+# -------------------- Client settings --------------------
+MONGO_MAX_POOL_SIZE = settings.get_int("MONGO_MAX_POOL_SIZE", 100)
+MONGO_MIN_POOL_SIZE = settings.get_int("MONGO_MIN_POOL_SIZE", 10)
+MONGO_MAX_IDLE_TIME_MS = settings.get_int("MONGO_MAX_IDLE_TIME_MS", 300000)
+MONGO_CONNECT_TIMEOUT_MS = settings.get_int("MONGO_CONNECT_TIMEOUT_MS", 5000)
+MONGO_SOCKET_TIMEOUT_MS = settings.get_int("MONGO_SOCKET_TIMEOUT_MS", 10000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = settings.get_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)
+# How long a request may wait for a free pooled connection before failing
+MONGO_WAIT_QUEUE_TIMEOUT_MS = settings.get_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000)
+# Comma-separated, in order of preference, e.g. "zstd,snappy,zlib"; empty disables compression
+MONGO_COMPRESSORS = settings.get("MONGO_COMPRESSORS", "")
+
+_client: motor.motor_asyncio.AsyncIOMotorClient | None = None
+
+
+# -------------------- Client lifecycle --------------------
+def get_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    """Return the shared client, creating it on first use.
+
+    The app opens it from the lifespan via open_client(); scripts that import
+    this module directly get one lazily.
+    """
+    global _client
+    if _client is None:
+        options = {
+            "maxPoolSize": MONGO_MAX_POOL_SIZE,
+            "minPoolSize": MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+            "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+            "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        }
+        if MONGO_COMPRESSORS:
+            options["compressors"] = MONGO_COMPRESSORS
+        _client = motor.motor_asyncio.AsyncIOMotorClient(
+            MONGO_URL,
+            event_listeners=[CommandMetricsListener(), PoolMetricsListener()],
+            **options,
+        )
+    return _client
+
+
+def get_database():
+    return get_client()[MONGO_DB_NAME]
+
+
+async def ping() -> bool:
+    await get_database().command("ping")
+    return True
+
+
+async def open_client():
+    """Connect, check the server answers, and open minPoolSize connections up
+    front so the first requests do not pay for the handshakes."""
+    await ping()
+    if MONGO_MIN_POOL_SIZE > 1:
+        # Concurrent commands each need their own connection
+        await asyncio.gather(*(ping() for _ in range(MONGO_MIN_POOL_SIZE)))
+
+
+def close_client():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# -------------------- Database handle --------------------
+class _Database:
+    """Stands in for the Motor database so modules can keep `from database import db`
+    while the client itself is created and closed by the app lifespan."""
+
+    def __getattr__(self, name):
+        return getattr(get_database(), name)
+
+    def __getitem__(self, name):
+        return get_database()[name]
+
+
+db = _Database()
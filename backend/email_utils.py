@@ -1,24 +1,154 @@
+import asyncio
+import logging
 import smtplib
+import time
+from collections import deque
 from email.mime.text import MIMEText
-from dotenv import load_dotenv
-import os
+from metrics import SMTP_LATENCY
+from settings import settings
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+SMTP_SERVER = settings.get("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = settings.get_int("SMTP_PORT", 587)
+SMTP_STARTTLS = settings.get_bool("SMTP_STARTTLS", True)
+SMTP_TIMEOUT = settings.get_float("SMTP_TIMEOUT", 10)
+# Max concurrent sends; also the max number of open SMTP connections
+SMTP_POOL_SIZE = settings.get_int("SMTP_POOL_SIZE", 4)
+SMTP_MAX_RETRIES = settings.get_int("SMTP_MAX_RETRIES", 3)
+SMTP_RETRY_BACKOFF = settings.get_float("SMTP_RETRY_BACKOFF", 0.5)
+# Idle connections older than this get a NOOP before reuse; fresher ones are
+# used as is, and a send on one the server dropped anyway is retried
+SMTP_PROBE_AFTER = settings.get_float("SMTP_PROBE_AFTER", 30)
+SENDER_EMAIL = settings.get("SENDER_EMAIL")
+SENDER_PASSWORD = settings.get("SENDER_PASSWORD")
 
-def send_otp_email(to_email: str, otp: str):
-    subject = "Your OTP Verification Code"
-    body = f"Your OTP for account verification is: {otp}\n\nThis code is valid for 5 minutes."
-    msg = MIMEText(body)
-    msg["Subject"] = subject
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying on a fresh connection; a rejected recipient or
+    bad credentials fail straight away."""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    # smtplib errors subclass OSError, so plain socket errors are checked last
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+def build_otp_message(to_email: str, otp: str) -> MIMEText:
+    msg = MIMEText(f"Your OTP code is: {otp}\nIt will expire in 5 minutes.")
+    msg["Subject"] = "Your OTP Verification Code"
     msg["From"] = SENDER_EMAIL
     msg["To"] = to_email
+    return msg
+
+
+# -------------------- SMTP connection pool --------------------
+class SMTPPool:
+    """A small pool of authenticated SMTP connections shared by all senders.
+
+    smtplib is blocking, so every network call runs in a worker thread; the
+    semaphore caps how many sends (and therefore connections) are in flight.
+    """
+
+    def __init__(self, host: str = SMTP_SERVER, port: int = SMTP_PORT, *,
+                 username: str | None = SENDER_EMAIL, password: str | None = SENDER_PASSWORD,
+                 starttls: bool = SMTP_STARTTLS, size: int = SMTP_POOL_SIZE,
+                 max_retries: int = SMTP_MAX_RETRIES, backoff: float = SMTP_RETRY_BACKOFF,
+                 timeout: float = SMTP_TIMEOUT, probe_after: float = SMTP_PROBE_AFTER):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.size = size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.probe_after = probe_after
+        # (connection, time.monotonic() when it was last used)
+        self._idle: deque[tuple[smtplib.SMTP, float]] = deque()
+        self._slots: asyncio.Semaphore | None = None
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except BaseException:
+            server.close()
+            raise
+        return server
+
+    def _checkout(self) -> smtplib.SMTP:
+        # Reuse an idle connection if the server still answers, otherwise dial a new one.
+        # Several sender threads share the deque, so pop and handle empty rather than check first.
+        while True:
+            try:
+                server, last_used = self._idle.pop()
+            except IndexError:
+                break
+            if time.monotonic() - last_used < self.probe_after:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except OSError:
+                pass
+            self._discard(server)
+        return self._connect()
+
+    @staticmethod
+    def _discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _send_blocking(self, msg):
+        server = self._checkout()
+        try:
+            server.send_message(msg)
+        except OSError as e:
+            if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)) \
+                    or not isinstance(e, smtplib.SMTPException):
+                self._discard(server)
+                raise
+            # The session may be mid-transaction; reset it before handing it back
+            try:
+                server.rset()
+                self._idle.append((server, time.monotonic()))
+            except Exception:
+                self._discard(server)
+            raise
+        self._idle.append((server, time.monotonic()))
+
+    async def send(self, msg):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            start = time.perf_counter()
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await asyncio.to_thread(self._send_blocking, msg)
+                    SMTP_LATENCY.labels("ok").observe(time.perf_counter() - start)
+                    return
+                except OSError as e:
+                    if attempt == self.max_retries or not is_transient(e):
+                        SMTP_LATENCY.labels("error").observe(time.perf_counter() - start)
+                        raise
+                    delay = self.backoff * (2 ** attempt)
+                    logger.warning("SMTP send to %s failed (%s), retrying in %.1fs", msg["To"], e, delay)
+                    await asyncio.sleep(delay)
+
+    def close(self):
+        while self._idle:
+            self._discard(self._idle.pop()[0])
+
+
+smtp_pool = SMTPPool()
 
-    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-        server.starttls()
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, to_email, msg.as_string())
+async def send_otp_email(to_email: str, otp: str):
+    await smtp_pool.send(build_otp_message(to_email, otp))
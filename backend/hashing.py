@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from fastapi import HTTPException, status
+from metrics import ARGON2_LATENCY, ARGON2_QUEUE_WAIT, timed
+from settings import settings
+
+# -------------------- Password hashing --------------------
+# Argon2 cost parameters; pick them for the host with `python calibrate_argon2.py`.
+# Unset values keep passlib's defaults.
+ARGON2_PARAMS = {
+    name: settings.get_int(env, 0)
+    for name, env in (
+        ("time_cost", "ARGON2_TIME_COST"),
+        ("memory_cost", "ARGON2_MEMORY_COST"),  # KiB
+        ("parallelism", "ARGON2_PARALLELISM"),
+    )
+    if settings.get(env)
+}
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Built on first use: passlib and the argon2 backend are slow to import, and
+    only the hashing pool workers and the rehash check need them."""
+    from passlib.context import CryptContext
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        **{f"argon2__{name}": value for name, value in ARGON2_PARAMS.items()},
+    )
+
+def hash_password(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return get_pwd_context().verify(plain_password, hashed_password)
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    pwd_context = get_pwd_context()
+    return [pwd_context.hash(password) for password in passwords]
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the stored hash was made with different Argon2 parameters. Cheap: only parses the hash."""
+    return get_pwd_context().needs_update(hashed_password)
+
+# -------------------- Pool settings --------------------
+HASH_POOL_WORKERS = settings.get_int("HASH_POOL_WORKERS", os.cpu_count() or 1)
+# Jobs allowed in flight (running + waiting) before callers start waiting
+HASH_QUEUE_SIZE = settings.get_int("HASH_QUEUE_SIZE", HASH_POOL_WORKERS * 4)
+# How long a caller may wait for a queue slot before we answer 503
+HASH_QUEUE_TIMEOUT = settings.get_float("HASH_QUEUE_TIMEOUT", 2.0)
+
+
+# Forked workers would inherit the event loop, open sockets and any locks held
+# by other threads at fork time. The forkserver imports this module once and
+# forks clean workers from that; spawn is the fallback where it is unavailable.
+HASH_POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# -------------------- Hashing service --------------------
+class HashingService:
+    """Runs Argon2 hash/verify in a process pool so the event loop never blocks on it."""
+
+    def __init__(self, workers: int = HASH_POOL_WORKERS, queue_size: int = HASH_QUEUE_SIZE,
+                 queue_timeout: float = HASH_QUEUE_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    def start(self):
+        if self._executor is None:
+            context = multiprocessing.get_context(HASH_POOL_START_METHOD)
+            if HASH_POOL_START_METHOD == "forkserver":
+                context.set_forkserver_preload([__name__])
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+            self._slots = asyncio.Semaphore(self.queue_size)
+
+    def shutdown(self):
+        """Waits for the workers to exit; from async code, run it in a thread."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    async def _run(self, operation: str, fn, *args, wait: bool = False):
+        if self._executor is None:
+            self.start()
+        # Backpressure: wait for a free slot, but give up instead of queueing
+        # forever unless the caller is a batch job that asked to wait
+        waited = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=None if wait else self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+        ARGON2_QUEUE_WAIT.observe(time.perf_counter() - waited)
+        try:
+            loop = asyncio.get_running_loop()
+            with timed(ARGON2_LATENCY.labels(operation)):
+                return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run("verify", verify_password, plain_password, hashed_password)
+
+    async def hash_many(self, passwords: list[str], chunk_size: int = 16) -> list[str]:
+        """Hash a batch across the pool. Each chunk takes one queue slot, and at
+        most `workers` chunks are queued at once so interactive logins still get
+        slots in between."""
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        parallel = asyncio.Semaphore(self.workers)
+
+        async def run_chunk(chunk):
+            async with parallel:
+                return await self._run("hash_batch", hash_passwords, chunk, wait=True)
+
+        results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+        return [hashed for chunk in results for hashed in chunk]
+
+
+hashing_service = HashingService()
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_service.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_service.verify(plain_password, hashed_password)
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import sys
+import time
+from bson import ObjectId
+from datetime import datetime
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from database import db
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Outbox messages are removed this long after being enqueued, delivered or not.
+# Failed ones would otherwise keep their plaintext OTP forever; by then the
+# code has long expired anyway. Changing it needs a collMod on the existing index.
+OUTBOX_RETENTION_SECONDS = settings.get_int("OUTBOX_RETENTION_SECONDS", 86400)
+
+# -------------------- Index definitions --------------------
+# (collection, keys, options)
+INDEXES = [
+    ("users", [("username", ASCENDING)], {"name": "username_unique", "unique": True}),
+    ("users", [("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ("otp_verifications", [("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+    ("otp_verifications", [("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ("refresh_tokens", [("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ("refresh_tokens", [("family", ASCENDING)], {"name": "family"}),
+    ("rate_limits", [("expires_at", ASCENDING)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+    ("email_outbox", [("status", ASCENDING), ("available_at", ASCENDING)], {"name": "status_available_at"}),
+    ("email_outbox", [("status", ASCENDING), ("lease_until", ASCENDING)], {"name": "status_lease_until"}),
+    ("email_outbox", [("created_at", ASCENDING)],
+     {"name": "created_at_ttl", "expireAfterSeconds": OUTBOX_RETENTION_SECONDS}),
+]
+
+# Every query shape the app issues, as (collection, filter, sort). Used by
+# check_query_plans(); add a shape here with every new query.
+QUERY_SHAPES = [
+    # Login, user cache misses, profile reads
+    ("users", {"username": "alice"}, None),
+    ("users", {"_id": ObjectId()}, None),
+    # Signup: email or username already taken
+    ("users", {"$or": [{"email": "alice@example.com"}, {"username": "alice"}]}, None),
+    # Rehash on login: conditional on the hash that was verified
+    ("users", {"_id": ObjectId(), "password": "$argon2id$..."}, None),
+    # Batch profile lookup
+    ("users", {"username": {"$in": ["alice", "bob"]}}, None),
+    # Bulk import: rows clashing with existing accounts
+    ("users", {"$or": [
+        {"username": {"$in": ["alice", "bob"]}},
+        {"email": {"$in": ["alice@example.com", "bob@example.com"]}},
+    ]}, None),
+    # Directory and export: first page, later pages
+    ("users", {}, [("_id", 1)]),
+    ("users", {"_id": {"$gt": ObjectId()}}, [("_id", 1)]),
+    ("otp_verifications", {"email": "alice@example.com"}, None),
+    # Outbox claim, queue depth, oldest pending, failed count
+    ("email_outbox", {"$or": [
+        {"status": "pending", "available_at": {"$lte": datetime.utcnow()}},
+        {"status": "sending", "lease_until": {"$lte": datetime.utcnow()}},
+    ]}, [("available_at", 1)]),
+    ("email_outbox", {"status": {"$in": ["pending", "sending"]}}, None),
+    ("email_outbox", {"status": {"$in": ["pending", "sending"]}}, [("created_at", 1)]),
+    ("email_outbox", {"status": "failed"}, None),
+    ("refresh_tokens", {"_id": "digest", "used": False, "expires_at": {"$gt": datetime.utcnow()}}, None),
+    ("refresh_tokens", {"family": "0123456789abcdef"}, None),
+    ("rate_limits", {"_id": "login_ip:127.0.0.1"}, None),
+]
+
+
+# -------------------- Migrations --------------------
+async def migrate_otp_verifications():
+    """Prepare otp_verifications for its unique email index.
+
+    Records written before OTPs expired have no expires_at and would never be
+    removed, so they are deleted (those users request a new code). Remaining
+    duplicates per email keep only the newest record, and the old non-unique
+    email index is dropped, since its key clashes with email_unique.
+    """
+    legacy = await db.otp_verifications.delete_many({"expires_at": {"$exists": False}})
+    if legacy.deleted_count:
+        logger.info("Deleted %d OTP records without expires_at", legacy.deleted_count)
+
+    duplicates = db.otp_verifications.aggregate([
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$group": {"_id": "$email", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ])
+    removed = 0
+    async for group in duplicates:
+        result = await db.otp_verifications.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    if removed:
+        logger.info("Deleted %d duplicate OTP records", removed)
+
+    for name, index in (await db.otp_verifications.index_information()).items():
+        if index["key"] == [("email", ASCENDING)] and name != "email_unique":
+            logger.info("Dropping index otp_verifications.%s, superseded by email_unique", name)
+            await db.otp_verifications.drop_index(name)
+
+
+# -------------------- Bootstrap --------------------
+async def _report_build_progress(interval: float = 2.0):
+    """Log the progress of in-flight index builds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # The filter goes in the command document itself; passed as the
+            # command's value it would be taken as currentOp's argument
+            ops = await db.client.admin.command(
+                {"currentOp": 1, "command.createIndexes": {"$exists": True}}
+            )
+        except Exception:
+            return  # no permission to see currentOp; the per-index log lines still cover it
+        for op in ops.get("inprog", []):
+            progress = op.get("progress") or {}
+            if progress.get("total"):
+                logger.info("Building index on %s: %s/%s (%.0f%%)", op.get("ns"),
+                            progress.get("done"), progress["total"],
+                            100 * progress.get("done", 0) / progress["total"])
+
+
+async def ensure_indexes():
+    """Create every index in INDEXES. Safe to run on every startup: existing
+    indexes with the same spec are a no-op."""
+    reporter = asyncio.create_task(_report_build_progress())
+    try:
+        try:
+            await migrate_otp_verifications()
+        except OperationFailure as e:
+            logger.error("Could not migrate otp_verifications: %s", e)
+        for position, (collection, keys, options) in enumerate(INDEXES, start=1):
+            start = time.perf_counter()
+            logger.info("[%d/%d] Ensuring index %s.%s", position, len(INDEXES), collection, options["name"])
+            try:
+                await db[collection].create_index(keys, **options)
+            except OperationFailure as e:
+                # e.g. duplicate usernames already stored; keep serving and leave it to an operator
+                logger.error("[%d/%d] Could not build index %s.%s: %s", position, len(INDEXES), collection,
+                             options["name"], e)
+                continue
+            logger.info("[%d/%d] Index %s.%s ready in %.2fs", position, len(INDEXES), collection,
+                        options["name"], time.perf_counter() - start)
+    finally:
+        reporter.cancel()
+
+
+# -------------------- Query plan check --------------------
+def _stages(plan: dict):
+    # Newer servers wrap the classic plan tree in "queryPlan"
+    plan = plan.get("queryPlan", plan)
+    yield plan.get("stage")
+    children = list(plan.get("inputStages", []))
+    if "inputStage" in plan:
+        children.append(plan["inputStage"])
+    for child in children:
+        yield from _stages(child)
+
+
+async def check_query_plans() -> list[str]:
+    """Run explain() on every query in QUERY_SHAPES and return the ones that scan the collection."""
+    failures = []
+    for collection, query, sort in QUERY_SHAPES:
+        command = {"find": collection, "filter": query}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        winning = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_stages(winning)):
+            failures.append(f"{collection} {query} sort={sort}")
+    return failures
+
+
+async def _main(argv):
+    await ensure_indexes()
+    if "--check" in argv:
+        failures = await check_query_plans()
+        for failure in failures:
+            print("COLLSCAN:", failure)
+        if failures:
+            return 1
+        print(f"All {len(QUERY_SHAPES)} query shapes use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
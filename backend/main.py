@@ -1,36 +1,84 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, Response, BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from datetime import timedelta
+from contextlib import asynccontextmanager
+import asyncio
+from datetime import datetime, timedelta
+import logging
 import random
-import smtplib
-import os
-from email.mime.text import MIMEText
-from pathlib import Path
-from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
 from app.profile import router as profile_router
-
-from database import db
-from models import UserCreate, OTPVerify, UserOut
-from auth import hash_password, verify_password, create_access_token, get_current_user, ACCESS_TOKEN_EXPIRE_MINUTES
-
-# -------------------- Load .env explicitly --------------------
-env_path = Path(__file__).parent / ".env"
-if not env_path.exists():
-    raise RuntimeError(f".env file not found at {env_path}")
-
-load_dotenv(dotenv_path=env_path)
-
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-
-# -------------------- Debug check --------------------
-if not SENDER_EMAIL or not SENDER_PASSWORD:
-    raise RuntimeError("SENDER_EMAIL or SENDER_PASSWORD not set in .env")
+from app.health import router as health_router, readiness
+from app.admin import router as admin_router
+from app.directory import router as directory_router
+
+from database import db, open_client, close_client
+from cache import start_caches, close_caches
+from models import UserCreate, OTPVerify, UserOut, RefreshRequest
+from refresh_tokens import issue_refresh_token, rotate_refresh_token
+from auth import (
+    hash_password_async,
+    verify_password_async,
+    needs_rehash,
+    rehash_password,
+    create_access_token,
+    token_claims_for,
+    get_token_claims,
+    require_admin,
+    claims_are_current,
+    load_user,
+    load_profile_version,
+    user_cache,
+    user_lookups,
+    token_cache,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+)
+from hashing import hashing_service
+from indexes import ensure_indexes
+from ratelimit import rate_limiter, client_ip
+from responses import FastJSONResponse, model_response, make_etag, etag_matches, not_modified, with_etag
+from metrics import MetricsMiddleware, metrics_payload, mark_process_dead
+from email_utils import SENDER_EMAIL, SENDER_PASSWORD, smtp_pool
+from outbox import OUTBOX_WORKER_ENABLED, enqueue_otp_email, outbox_stats, outbox_worker
+
+logger = logging.getLogger(__name__)
+
+# Matches the "expires in 5 minutes" wording of the OTP email
+OTP_EXPIRE_MINUTES = 5
+
+
+# -------------------- Lifespan --------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Settings come from the environment and backend/.env (see settings.py);
+    # missing mail credentials only matter once an OTP email is sent
+    if not SENDER_EMAIL or not SENDER_PASSWORD:
+        logger.warning("SENDER_EMAIL or SENDER_PASSWORD is not set; OTP emails will fail")
+    await open_client()
+    await ensure_indexes()
+    await start_caches()
+    hashing_service.start()
+    if OUTBOX_WORKER_ENABLED:
+        outbox_worker.start()
+    readiness.mark_started()
+    try:
+        yield
+    finally:
+        readiness.mark_stopping()
+        await outbox_worker.stop()
+        await asyncio.to_thread(hashing_service.shutdown)
+        await asyncio.to_thread(smtp_pool.close)
+        await close_caches()
+        close_client()
+        mark_process_dead()
 
 
 # -------------------- FastAPI app --------------------
-app = FastAPI(title="FastAPI Auth with MongoDB + OTP")
+app = FastAPI(
+    title="FastAPI Auth with MongoDB + OTP",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # -------------------- CORS --------------------
 app.add_middleware(
@@ -41,45 +89,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(profile_router, prefix="/users", tags=["users"])
-
-# -------------------- Helper: Send OTP --------------------
-def send_otp_email(recipient_email: str, otp: str):
-    try:
-        msg = MIMEText(f"Your OTP code is: {otp}\nIt will expire in 5 minutes.")
-        msg["Subject"] = "Your OTP Verification Code"
-        msg["From"] = SENDER_EMAIL
-        msg["To"] = recipient_email
-
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
-            server.starttls()
-            server.login(SENDER_EMAIL, SENDER_PASSWORD)
-            server.send_message(msg)
-
-        print(f"OTP sent to {recipient_email}: {otp}")
-
-    except Exception as e:
-        print("Email sending failed:", e)
-        raise HTTPException(status_code=500, detail="Failed to send OTP email")
+app.add_middleware(MetricsMiddleware)
 
+app.include_router(profile_router, prefix="/users", tags=["users"])
+app.include_router(directory_router, prefix="/users", tags=["users"])
+app.include_router(health_router)
+app.include_router(admin_router, prefix="/admin", tags=["admin"])
 
 # -------------------- Signup request (send OTP) --------------------
 @app.post("/signup-request")
-async def signup_request(user: UserCreate):
-    existing_user = await db.users.find_one({"email": user.email})
+async def signup_request(request: Request, user: UserCreate):
+    # Before any DB or Argon2 work, so spam cannot burn CPU
+    await rate_limiter.enforce(("signup_ip", client_ip(request)), ("signup_email", user.email.lower()))
+
+    existing_user = await db.users.find_one(
+        {"$or": [{"email": user.email}, {"username": user.username}]}, {"email": 1}
+    )
     if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+        if existing_user.get("email") == user.email:
+            raise HTTPException(status_code=400, detail="Email already registered")
+        raise HTTPException(status_code=400, detail="Username already taken")
 
     otp = str(random.randint(100000, 999999))
-    await db.otp_verifications.insert_one({
+    now = datetime.utcnow()
+    otp_entry = {
         "email": user.email,
         "username": user.username,
-        "password": hash_password(user.password),
+        "password": await hash_password_async(user.password),
         "otp": otp,
         "verified": False,
-    })
+        "created_at": now,
+        # Removed by the TTL index on expires_at; also checked on verify since
+        # the TTL monitor only runs about once a minute
+        "expires_at": now + timedelta(minutes=OTP_EXPIRE_MINUTES),
+    }
+    # One record per email: a repeated signup replaces the previous code
+    try:
+        await db.otp_verifications.replace_one({"email": user.email}, otp_entry, upsert=True)
+    except DuplicateKeyError:
+        # A concurrent request for the same email inserted first; overwrite it
+        await db.otp_verifications.replace_one({"email": user.email}, otp_entry, upsert=True)
 
-    send_otp_email(user.email, otp)
+    # Delivered by the outbox worker so a slow mail server never holds up the response
+    await enqueue_otp_email(user.email, otp)
     return {"message": "OTP sent to your email for verification."}
 
 
@@ -89,6 +141,10 @@ async def signup_verify(data: OTPVerify):
     otp_entry = await db.otp_verifications.find_one({"email": data.email})
     if not otp_entry:
         raise HTTPException(status_code=404, detail="No OTP request found for this email")
+    # Records without expires_at predate OTP expiry; never accept them
+    expires_at = otp_entry.get("expires_at")
+    if expires_at is None or expires_at < datetime.utcnow():
+        raise HTTPException(status_code=400, detail="OTP has expired")
     if otp_entry["otp"] != data.otp:
         raise HTTPException(status_code=400, detail="Invalid OTP")
 
@@ -97,7 +153,11 @@ async def signup_verify(data: OTPVerify):
         "email": otp_entry["email"],
         "password": otp_entry["password"],
     }
-    await db.users.insert_one(new_user)
+    try:
+        await db.users.insert_one(new_user)
+    except DuplicateKeyError:
+        # Someone registered the username or email after this OTP was requested
+        raise HTTPException(status_code=400, detail="Username or email already registered")
     await db.otp_verifications.delete_one({"email": data.email})
 
     return {"message": "Account verified successfully!"}
@@ -105,17 +165,72 @@ async def signup_verify(data: OTPVerify):
 
 # -------------------- Login --------------------
 @app.post("/login")
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, background_tasks: BackgroundTasks,
+                form_data: OAuth2PasswordRequestForm = Depends()):
+    # Before the user lookup and Argon2 verify, so credential stuffing cannot pin the CPU
+    await rate_limiter.enforce(("login_ip", client_ip(request)), ("login_username", form_data.username.lower()))
+
     db_user = await db.users.find_one({"username": form_data.username})
-    if not db_user or not verify_password(form_data.password, db_user["password"]):
+    if not db_user or not await verify_password_async(form_data.password, db_user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
+    # Upgrade hashes made with old Argon2 parameters once the response is out
+    if needs_rehash(db_user["password"]):
+        background_tasks.add_task(rehash_password, db_user["_id"], db_user["password"], form_data.password)
+
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    token = create_access_token(token_claims_for(db_user), expires_delta=access_token_expires)
+    refresh_token = await issue_refresh_token(db_user)
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+# -------------------- Refresh access token --------------------
+@app.post("/token/refresh")
+async def refresh_access_token(data: RefreshRequest):
+    """Trade a refresh token for a new access token and a new refresh token.
+    Costs an HMAC and two small writes instead of an Argon2 verify."""
+    record, refresh_token = await rotate_refresh_token(data.refresh_token)
+    user = await load_user(record["username"])
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    token = create_access_token({"sub": db_user["username"]}, expires_delta=access_token_expires)
-    return {"access_token": token, "token_type": "bearer"}
+    token = create_access_token(token_claims_for(user), expires_delta=access_token_expires)
+    return {"access_token": token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 # -------------------- Protected profile route --------------------
 @app.get("/me", response_model=UserOut)
-async def read_current_user(current_user: dict = Depends(get_current_user)):
-    return UserOut(username=current_user["username"], email=current_user["email"])
+async def read_current_user(request: Request, claims: dict = Depends(get_token_claims)):
+    if await claims_are_current(claims):
+        etag = make_etag("me", claims["uid"], claims["pv"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        return with_etag(model_response(UserOut(username=claims["sub"], email=claims["email"])), etag)
+
+    # Probe just the version only when there is an ETag to compare it with
+    if "if-none-match" in request.headers:
+        user_id, version = await load_profile_version(claims["sub"])
+        etag = make_etag("me", user_id, version)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+    current_user = await load_user(claims["sub"])
+    etag = make_etag("me", current_user["_id"], current_user.get("profile_version", 0))
+    return with_etag(model_response(UserOut(username=current_user["username"], email=current_user["email"])), etag)
+
+
+# -------------------- Outbox metrics --------------------
+@app.get("/outbox/stats", dependencies=[Depends(require_admin)])
+async def read_outbox_stats():
+    return await outbox_stats()
+
+
+# -------------------- Cache metrics --------------------
+@app.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def read_cache_stats():
+    return {"users": user_cache.stats(), "tokens": token_cache.stats(), "user_lookups": user_lookups.stats()}
+
+
+# -------------------- Prometheus metrics --------------------
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
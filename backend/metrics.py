@@ -0,0 +1,169 @@
+import os
+import time
+# Before prometheus_client, which reads PROMETHEUS_MULTIPROC_DIR at import
+from settings import settings
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+
+# With several uvicorn workers, set PROMETHEUS_MULTIPROC_DIR to an empty
+# directory shared by all of them; /metrics then aggregates every worker.
+MULTIPROC_DIR = settings.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Sub-millisecond buckets for in-process work, up to seconds for network calls
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+SLOW_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# -------------------- Metric definitions --------------------
+REQUEST_COUNT = Counter(
+    "http_requests_total", "HTTP requests by route and status", ["method", "route", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"],
+    buckets=SLOW_BUCKETS,
+)
+ARGON2_LATENCY = Histogram(
+    "argon2_duration_seconds", "Argon2 hash/verify time, including the trip to the process pool",
+    ["operation"], buckets=SLOW_BUCKETS,
+)
+ARGON2_QUEUE_WAIT = Histogram(
+    "argon2_queue_wait_seconds", "Time spent waiting for a hashing pool slot", buckets=SLOW_BUCKETS,
+)
+JWT_LATENCY = Histogram(
+    "jwt_duration_seconds", "JWT encode/decode time", ["operation"], buckets=FAST_BUCKETS,
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command time by collection and command",
+    ["collection", "command", "outcome"], buckets=FAST_BUCKETS + (2.5, 5.0),
+)
+MONGO_POOL_CHECKOUT_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool",
+    ["address"], buckets=FAST_BUCKETS + (2.5, 5.0),
+)
+MONGO_POOL_CHECKOUT_FAILED = Counter(
+    "mongo_pool_checkout_failed_total", "Failed connection checkouts by reason", ["address", "reason"]
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongo_pool_connections", "Open connections in the pool", ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_CHECKED_OUT = Gauge(
+    "mongo_pool_checked_out", "Connections currently checked out", ["address"], multiprocess_mode="livesum"
+)
+MONGO_POOL_SATURATION = Gauge(
+    "mongo_pool_saturation_ratio", "Checked-out connections as a fraction of maxPoolSize",
+    ["address"], multiprocess_mode="livemax",
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "singleflight_calls_total", "Coalesced lookups: executed vs. collapsed into an in-flight one",
+    ["name", "outcome"],
+)
+RATE_LIMITED = Counter(
+    "rate_limited_total", "Requests rejected with 429 by limit", ["limit"]
+)
+OUTBOX_DELIVERY_LAG = Histogram(
+    "outbox_delivery_lag_seconds", "Time from enqueueing an outbox message to its delivery",
+    buckets=SLOW_BUCKETS + (60.0, 120.0, 300.0),
+)
+# Counted from the shared collection, so every worker sees the same queue;
+# report whichever live worker counted last
+OUTBOX_DEPTH = Gauge(
+    "outbox_depth", "Outbox messages by status (queued: pending or sending)", ["status"],
+    multiprocess_mode="livemostrecent",
+)
+SMTP_LATENCY = Histogram(
+    "smtp_send_duration_seconds", "SMTP send time including retries", ["outcome"], buckets=SLOW_BUCKETS,
+)
+
+
+class timed:
+    """Observe the duration of a with-block on a histogram (already labelled)."""
+
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+# -------------------- HTTP middleware --------------------
+def route_template(scope) -> str:
+    """Full path template of the matched route, e.g. /users/me.
+
+    Depending on the FastAPI version, routes from include_router(prefix=...) carry
+    either the prefixed template or only their own (/me). In the second case the
+    prefix is whatever part of the request path precedes what the route matched.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope["path"]
+    regex = getattr(route, "path_regex", None)
+    if regex is None or regex.match(path):
+        return template
+    for i in range(1, len(path)):
+        if path[i] == "/" and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware (no BaseHTTPMiddleware) so the hot path stays cheap.
+
+    Requests are labelled with the route template, e.g. /users/me, never the raw
+    path, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route on the shared scope
+            path = route_template(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.labels(method, path).observe(time.perf_counter() - start)
+            REQUEST_COUNT.labels(method, path, str(status_code)).inc()
+
+
+# -------------------- Exposition --------------------
+def metrics_payload() -> tuple[bytes, str]:
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -26,4 +26,25 @@ class BioIn(BaseModel):
 class BioOut(BaseModel):
     username: str
     email: str
-    bio: Optional[str] = None
\ No newline at end of file
+    bio: Optional[str] = None
+
+# -------------------- Batch profile lookup --------------------
+class ProfilesRequest(BaseModel):
+    usernames: list[str] = Field(..., min_length=1)
+
+class PublicProfile(BaseModel):
+    username: str
+    bio: Optional[str] = None
+
+class ProfilesOut(BaseModel):
+    profiles: list[PublicProfile]
+    missing: list[str]
+
+# -------------------- User directory --------------------
+class DirectoryPage(BaseModel):
+    users: list[dict]
+    next_cursor: Optional[str] = None
+
+# -------------------- Token models --------------------
+class RefreshRequest(BaseModel):
+    refresh_token: str
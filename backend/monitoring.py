@@ -0,0 +1,164 @@
+import logging
+import threading
+import time
+from pymongo import monitoring
+from settings import settings
+from metrics import (
+    MONGO_LATENCY,
+    MONGO_POOL_CHECKED_OUT,
+    MONGO_POOL_CHECKOUT_FAILED,
+    MONGO_POOL_CHECKOUT_WAIT,
+    MONGO_POOL_CONNECTIONS,
+    MONGO_POOL_SATURATION,
+)
+
+logger = logging.getLogger(__name__)
+
+# Commands (and pool checkouts) slower than this are logged
+MONGO_SLOW_MS = settings.get_float("MONGO_SLOW_MS", 100)
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    """Collection a command targets, or "-" for database/admin commands."""
+    if command_name == "getMore":
+        return command.get("collection", "-")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else "-"
+
+
+def command_filter(command_name: str, command: dict):
+    """The query part of a command, wherever that command keeps it."""
+    if command_name in ("find", "count", "distinct"):
+        return command.get("filter", command.get("query"))
+    if command_name == "findAndModify":
+        return command.get("query")
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return statements[0].get("q")
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or [{}]
+        return pipeline[0].get("$match")
+    return None
+
+
+def filter_shape(value):
+    """Replace every literal in a filter with its type name, so the log shows
+    the query shape without leaking user data: {"username": "str"}."""
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [filter_shape(value[0])] if value else []
+    return type(value).__name__
+
+
+# -------------------- Command listener --------------------
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every command Motor sends, labelled by collection and command, and
+    logs the ones slower than MONGO_SLOW_MS with their filter shape."""
+
+    def __init__(self, slow_ms: float = MONGO_SLOW_MS):
+        self.slow_ms = slow_ms
+        # request_id -> (collection, command); succeeded/failed events do not carry the command
+        self._inflight: dict[int, tuple[str, dict]] = {}
+
+    def started(self, event):
+        self._inflight[event.request_id] = (command_collection(event.command_name, event.command), event.command)
+
+    def _finished(self, event, outcome: str):
+        collection, command = self._inflight.pop(event.request_id, ("-", {}))
+        MONGO_LATENCY.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+        elapsed_ms = event.duration_micros / 1000
+        if elapsed_ms >= self.slow_ms:
+            logger.warning(
+                "Slow Mongo command %s on %s took %.1fms (%s) filter=%s",
+                event.command_name, collection, elapsed_ms, outcome,
+                filter_shape(command_filter(event.command_name, command)),
+            )
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+# -------------------- Pool listener --------------------
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Tracks checkout wait time and how close each pool is to maxPoolSize."""
+
+    def __init__(self, slow_ms: float = MONGO_SLOW_MS):
+        self.slow_ms = slow_ms
+        self._max_size: dict[str, int] = {}
+        self._checked_out: dict[str, int] = {}
+        self._lock = threading.Lock()
+        # A checkout starts and finishes on the same thread
+        self._local = threading.local()
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _set_checked_out(self, address: str, delta: int):
+        with self._lock:
+            count = self._checked_out.get(address, 0) + delta
+            self._checked_out[address] = count
+        MONGO_POOL_CHECKED_OUT.labels(address).set(count)
+        max_size = self._max_size.get(address) or 100
+        MONGO_POOL_SATURATION.labels(address).set(count / max_size)
+
+    def pool_created(self, event):
+        self._max_size[self._address(event)] = event.options.get("maxPoolSize", 100)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        address = self._address(event)
+        MONGO_POOL_CONNECTIONS.labels(address).set(0)
+        with self._lock:
+            self._checked_out[address] = 0
+        MONGO_POOL_CHECKED_OUT.labels(address).set(0)
+        MONGO_POOL_SATURATION.labels(address).set(0)
+
+    def connection_created(self, event):
+        MONGO_POOL_CONNECTIONS.labels(self._address(event)).inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        MONGO_POOL_CONNECTIONS.labels(self._address(event)).dec()
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _checkout_wait(self, event) -> float:
+        # pymongo >= 4.7 reports the duration itself
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            return duration
+        started = getattr(self._local, "started", None)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event):
+        address = self._address(event)
+        MONGO_POOL_CHECKOUT_FAILED.labels(address, str(event.reason)).inc()
+        logger.warning("Mongo pool checkout on %s failed after %.1fms: %s",
+                       address, self._checkout_wait(event) * 1000, event.reason)
+
+    def connection_checked_out(self, event):
+        address = self._address(event)
+        wait = self._checkout_wait(event)
+        MONGO_POOL_CHECKOUT_WAIT.labels(address).observe(wait)
+        self._set_checked_out(address, 1)
+        if wait * 1000 >= self.slow_ms:
+            logger.warning("Waited %.1fms for a Mongo connection on %s (%d checked out, maxPoolSize=%s)",
+                           wait * 1000, address, self._checked_out.get(address, 0),
+                           self._max_size.get(address, 100))
+
+    def connection_checked_in(self, event):
+        self._set_checked_out(self._address(event), -1)
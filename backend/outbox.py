@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from database import db
+from email_utils import send_otp_email
+from metrics import OUTBOX_DELIVERY_LAG, OUTBOX_DEPTH
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_WORKER_ENABLED = settings.get_bool("OUTBOX_WORKER_ENABLED", True)
+OUTBOX_BATCH_SIZE = settings.get_int("OUTBOX_BATCH_SIZE", 20)
+# A claimed message is handed to another worker if not finished within the lease
+OUTBOX_LEASE_SECONDS = settings.get_float("OUTBOX_LEASE_SECONDS", 60)
+OUTBOX_POLL_INTERVAL = settings.get_float("OUTBOX_POLL_INTERVAL", 1.0)
+OUTBOX_MAX_ATTEMPTS = settings.get_int("OUTBOX_MAX_ATTEMPTS", 5)
+OUTBOX_RETRY_BACKOFF = settings.get_float("OUTBOX_RETRY_BACKOFF", 5)
+# How long stop() lets an in-flight batch finish before cancelling it
+OUTBOX_STOP_TIMEOUT = settings.get_float("OUTBOX_STOP_TIMEOUT", 10)
+# How often the worker recounts the queue for the outbox_depth gauge
+OUTBOX_DEPTH_INTERVAL = settings.get_float("OUTBOX_DEPTH_INTERVAL", 15)
+
+PENDING = "pending"
+SENDING = "sending"
+FAILED = "failed"
+
+
+# -------------------- Producer --------------------
+async def enqueue_otp_email(email: str, otp: str):
+    now = datetime.utcnow()
+    await db.email_outbox.insert_one({
+        "kind": "otp",
+        "to": email,
+        "otp": otp,
+        "status": PENDING,
+        "attempts": 0,
+        "created_at": now,
+        "available_at": now,
+        "lease_until": None,
+    })
+    outbox_worker.notify()
+
+
+# -------------------- Worker --------------------
+class OutboxWorker:
+    """Claims outbox messages in batches and delivers them.
+
+    A message is claimed by atomically flipping it to "sending" with a lease.
+    If the worker dies mid-batch the lease runs out and the message becomes
+    claimable again, so delivery is at-least-once.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, lease_seconds: float = OUTBOX_LEASE_SECONDS,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+                 retry_backoff: float = OUTBOX_RETRY_BACKOFF, depth_interval: float = OUTBOX_DEPTH_INTERVAL):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.depth_interval = depth_interval
+        self.worker_id = uuid.uuid4().hex
+        self.last_delivery_lag: float | None = None
+        self.delivered = 0
+        self.failed = 0
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+        self._depth_counted_at: float | None = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self, now: datetime):
+        return await db.email_outbox.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "available_at": {"$lte": now}},
+                {"status": SENDING, "lease_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {"status": SENDING, "worker": self.worker_id,
+                         "lease_until": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _deliver(self, message: dict):
+        try:
+            await send_otp_email(message["to"], message["otp"])
+        except Exception as e:
+            now = datetime.utcnow()
+            if message["attempts"] >= self.max_attempts:
+                logger.error("Giving up on outbox message %s to %s: %s", message["_id"], message["to"], e)
+                update = {"status": FAILED, "last_error": str(e), "lease_until": None}
+                self.failed += 1
+            else:
+                delay = self.retry_backoff * (2 ** (message["attempts"] - 1))
+                logger.warning("Outbox message %s to %s failed (%s), retrying in %.0fs",
+                               message["_id"], message["to"], e, delay)
+                update = {"status": PENDING, "last_error": str(e), "lease_until": None,
+                          "available_at": now + timedelta(seconds=delay)}
+            await db.email_outbox.update_one({"_id": message["_id"], "worker": self.worker_id}, {"$set": update})
+            return
+
+        # Only the lease holder may complete the message
+        await db.email_outbox.delete_one({"_id": message["_id"], "worker": self.worker_id})
+        self.delivered += 1
+        self.last_delivery_lag = (datetime.utcnow() - message["created_at"]).total_seconds()
+        OUTBOX_DELIVERY_LAG.observe(self.last_delivery_lag)
+
+    async def refresh_depth(self):
+        """Recount the queue for the outbox_depth gauge, at most once per depth_interval."""
+        now = time.monotonic()
+        if self._depth_counted_at is not None and now - self._depth_counted_at < self.depth_interval:
+            return
+        self._depth_counted_at = now
+        counts = await count_outbox()
+        OUTBOX_DEPTH.labels("queued").set(counts["depth"])
+        OUTBOX_DEPTH.labels("failed").set(counts["failed"])
+
+    async def run_once(self) -> int:
+        now = datetime.utcnow()
+        batch = []
+        while len(batch) < self.batch_size:
+            message = await self._claim(now)
+            if message is None:
+                break
+            batch.append(message)
+        if batch:
+            await asyncio.gather(*(self._deliver(m) for m in batch))
+        return len(batch)
+
+    async def run_forever(self):
+        self._wakeup = asyncio.Event()
+        while not self._stopping:
+            try:
+                claimed = await self.run_once()
+                await self.refresh_depth()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox worker iteration failed")
+                claimed = 0
+            if claimed < self.batch_size and not self._stopping:
+                self._wakeup.clear()
+                # asyncio.timeout, unlike wait_for on 3.11, never swallows a
+                # cancellation that lands in the same tick as the wakeup
+                try:
+                    async with asyncio.timeout(self.poll_interval):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    pass
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self, timeout: float = OUTBOX_STOP_TIMEOUT):
+        """Let the current batch finish, then exit; cancel if that takes longer than timeout."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.notify()
+        done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            logger.warning("Outbox worker did not stop within %.0fs; cancelling it", timeout)
+            self._task.cancel()
+            done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            logger.error("Outbox worker ignored cancellation; abandoning it")
+        elif not self._task.cancelled() and self._task.exception() is not None:
+            logger.error("Outbox worker exited with an error", exc_info=self._task.exception())
+        self._task = None
+        self._wakeup = None
+
+
+outbox_worker = OutboxWorker()
+
+
+# -------------------- Metrics --------------------
+async def count_outbox() -> dict:
+    """Queued and failed message counts and the age of the oldest queued one."""
+    depth = await db.email_outbox.count_documents({"status": {"$in": [PENDING, SENDING]}})
+    failed = await db.email_outbox.count_documents({"status": FAILED})
+    oldest = await db.email_outbox.find_one(
+        {"status": {"$in": [PENDING, SENDING]}},
+        projection={"created_at": 1},
+        sort=[("created_at", 1)],
+    )
+    oldest_age = (datetime.utcnow() - oldest["created_at"]).total_seconds() if oldest else 0.0
+    return {"depth": depth, "failed": failed, "oldest_pending_age_seconds": round(oldest_age, 3)}
+
+
+async def outbox_stats() -> dict:
+    """Queue depth and delivery lag for the email outbox."""
+    return {
+        **await count_outbox(),
+        "last_delivery_lag_seconds": outbox_worker.last_delivery_lag,
+        "delivered": outbox_worker.delivered,
+    }
+
+
+# -------------------- Standalone worker --------------------
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(outbox_worker.run_forever())
@@ -0,0 +1,121 @@
+import math
+import time
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request, status
+from pymongo import ReturnDocument
+from cache import TTLCache
+from database import db
+from metrics import RATE_LIMITED
+from settings import settings
+
+RATE_LIMIT_ENABLED = settings.get_bool("RATE_LIMIT_ENABLED", True)
+# "memory" keeps counters per worker; "mongo" shares them across workers and replicas
+RATE_LIMIT_BACKEND = settings.get("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MEMORY_KEYS = settings.get_int("RATE_LIMIT_MEMORY_KEYS", 100000)
+
+
+# -------------------- Limits --------------------
+class Limit:
+    def __init__(self, name: str, spec: str):
+        """spec is "<requests>/<seconds>", e.g. "10/60"."""
+        count, window = spec.split("/")
+        self.name = name
+        self.limit = int(count)
+        self.window = float(window)
+
+
+LIMITS = {
+    limit.name: limit for limit in (
+        Limit("login_ip", settings.get("RATE_LIMIT_LOGIN_IP", "30/60")),
+        Limit("login_username", settings.get("RATE_LIMIT_LOGIN_USERNAME", "10/60")),
+        Limit("signup_ip", settings.get("RATE_LIMIT_SIGNUP_IP", "10/60")),
+        Limit("signup_email", settings.get("RATE_LIMIT_SIGNUP_EMAIL", "3/300")),
+    )
+}
+
+
+# -------------------- Backends --------------------
+# Both backends implement a sliding-window counter: a count for the current
+# fixed window plus the previous one, weighted by how much of the previous
+# window still overlaps the sliding window. One read-modify-write per check.
+class InMemoryBackend:
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_KEYS):
+        # key -> [window index, current count, previous count]
+        self._counters = TTLCache(max_keys, ttl=3600)
+
+    async def hit(self, key: str, window: float, index: int) -> tuple[int, int]:
+        entry = self._counters.get(key)
+        if entry is None or entry[0] < index - 1:
+            entry = [index, 0, 0]
+        elif entry[0] == index - 1:
+            entry = [index, 0, entry[1]]
+        entry[1] += 1
+        self._counters.set(key, entry, ttl=2 * window)
+        return entry[1], entry[2]
+
+
+class MongoBackend:
+    """Counters in the rate_limits collection; a TTL index on expires_at cleans up."""
+
+    async def hit(self, key: str, window: float, index: int) -> tuple[int, int]:
+        # A single pipeline update rolls the window and increments atomically;
+        # every field in one $set stage reads the document as it was before
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [{"$set": {
+                "prev": {"$cond": [
+                    {"$eq": ["$win", index]}, "$prev",
+                    {"$cond": [{"$eq": ["$win", index - 1]}, "$cur", 0]},
+                ]},
+                "cur": {"$cond": [{"$eq": ["$win", index]}, {"$add": ["$cur", 1]}, 1]},
+                "win": index,
+                "expires_at": datetime.utcnow() + timedelta(seconds=2 * window),
+            }}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["cur"], doc["prev"]
+
+
+# -------------------- Limiter --------------------
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+
+    async def retry_after(self, limit: Limit, value: str) -> int | None:
+        """Count one attempt; return seconds to wait if over the limit, else None."""
+        now = time.time()
+        index = int(now // limit.window)
+        current, previous = await self.backend.hit(f"{limit.name}:{value}", limit.window, index)
+        elapsed = now - index * limit.window
+        estimate = previous * (1 - elapsed / limit.window) + current
+        if estimate <= limit.limit:
+            return None
+        return max(1, math.ceil(limit.window - elapsed))
+
+    async def enforce(self, *checks: tuple[str, str]):
+        """Raise 429 if any (limit name, key) pair is over its limit."""
+        if not self.enabled:
+            return
+        for name, value in checks:
+            if not value:
+                continue
+            wait = await self.retry_after(LIMITS[name], value)
+            if wait is not None:
+                RATE_LIMITED.labels(name).inc()
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests, please try again later",
+                    headers={"Retry-After": str(wait)},
+                )
+
+
+def client_ip(request: Request) -> str:
+    # uvicorn replaces request.client with the X-Forwarded-For address only for
+    # proxies listed in FORWARDED_ALLOW_IPS (see serve.py); otherwise this is the
+    # peer address, which behind a load balancer is the balancer itself
+    return request.client.host if request.client else ""
+
+
+rate_limiter = RateLimiter(MongoBackend() if RATE_LIMIT_BACKEND == "mongo" else InMemoryBackend())
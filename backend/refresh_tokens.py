@@ -0,0 +1,77 @@
+import hashlib
+import hmac
+import logging
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from auth import SECRET_KEY
+from database import db
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_EXPIRE_DAYS = settings.get_int("REFRESH_TOKEN_EXPIRE_DAYS", 30)
+REFRESH_TOKEN_SECRET = settings.get("REFRESH_TOKEN_SECRET", SECRET_KEY)
+
+
+def _digest(token: str) -> str:
+    # Refresh tokens are 256 random bits, so a keyed HMAC is enough; no need for Argon2 here
+    return hmac.new(REFRESH_TOKEN_SECRET.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+def _invalid():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+# -------------------- Issue --------------------
+async def issue_refresh_token(user: dict, family: str | None = None) -> str:
+    """Store the digest of a new refresh token and return the token itself.
+
+    Tokens descended from one login share a family, so detected reuse can
+    revoke the whole chain. Expired records are removed by a TTL index.
+    """
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "_id": _digest(token),
+        "user_id": user["_id"],
+        "username": user["username"],
+        "family": family or uuid.uuid4().hex,
+        "used": False,
+        "created_at": now,
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return token
+
+
+# -------------------- Rotate --------------------
+async def rotate_refresh_token(token: str) -> tuple[dict, str]:
+    """Spend a refresh token and issue its successor.
+
+    Returns the spent record and the new token. Presenting a token that was
+    already spent means it leaked (or a client is replaying it), so every
+    token in its family is revoked.
+    """
+    digest = _digest(token)
+    now = datetime.utcnow()
+    record = await db.refresh_tokens.find_one_and_update(
+        {"_id": digest, "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True, "used_at": now}},
+    )
+    if record is None:
+        spent = await db.refresh_tokens.find_one({"_id": digest}, {"used": 1, "family": 1, "username": 1})
+        if spent and spent["used"]:
+            logger.warning("Refresh token reuse for user %s; revoking token family %s",
+                           spent["username"], spent["family"])
+            await db.refresh_tokens.delete_many({"family": spent["family"]})
+        raise _invalid()
+
+    new_token = await issue_refresh_token(
+        {"_id": record["user_id"], "username": record["username"]}, family=record["family"]
+    )
+    return record, new_token
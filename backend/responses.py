@@ -0,0 +1,65 @@
+import json
+from typing import Any
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Fastest available encoder: orjson, then msgspec, then the stdlib
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    if msgspec is not None:
+        return msgspec.json.encode(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """App-wide default response class; same output as JSONResponse, faster encoder."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def model_response(model: BaseModel, status_code: int = 200) -> FastJSONResponse:
+    """Serialize an already-validated model straight to a response.
+
+    Returning a Response from a handler makes FastAPI skip its response_model
+    validation and jsonable_encoder pass, which would otherwise re-check a model
+    the handler just built. Keep response_model on the route for the OpenAPI docs.
+    """
+    return FastJSONResponse(model.model_dump(), status_code=status_code)
+
+
+# -------------------- Conditional GET --------------------
+# Clients must revalidate every time, but a matching ETag costs them an empty 304
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag in tags
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL})
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ETAG_CACHE_CONTROL
+    return response
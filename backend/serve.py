@@ -0,0 +1,115 @@
+"""Production launcher for the API.
+
+    python serve.py            # one worker per available core, uvloop/httptools if installed
+    python serve.py --reload   # development: single process, restarts on code changes
+
+Worker count honours cgroup CPU quotas (so a container limited to 2 CPUs on a
+64-core host runs 2 workers); WEB_CONCURRENCY overrides it. On SIGTERM each
+worker stops accepting connections and lets in-flight requests finish for up
+to GRACEFUL_TIMEOUT seconds. Send SIGHUP to the supervisor to restart workers.
+
+Behind a load balancer or reverse proxy, set FORWARDED_ALLOW_IPS to the proxy
+addresses (comma-separated, or "*" if only the proxy can reach the workers) so
+the client address, and with it the per-IP rate limits, comes from
+X-Forwarded-For rather than the proxy itself.
+"""
+import argparse
+import importlib.util
+import math
+import os
+import tempfile
+import uvicorn
+# Loads .env before anything below derives defaults from the environment
+from settings import settings
+
+HOST = settings.get("HOST", "0.0.0.0")
+PORT = settings.get_int("PORT", 8000)
+GRACEFUL_TIMEOUT = settings.get_int("GRACEFUL_TIMEOUT", 30)
+KEEPALIVE_TIMEOUT = settings.get_int("KEEPALIVE_TIMEOUT", 5)
+# Proxies trusted to set X-Forwarded-For / X-Forwarded-Proto
+FORWARDED_ALLOW_IPS = settings.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+# -------------------- CPU sizing --------------------
+def cgroup_cpu_limit() -> float | None:
+    """CPU quota from cgroup v2 or v1, or None if unlimited or not in a cgroup."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def available_cpus() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def worker_count() -> int:
+    if settings.get("WEB_CONCURRENCY"):
+        return max(1, settings.get_int("WEB_CONCURRENCY", 1))
+    return available_cpus()
+
+
+def has_module(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+# -------------------- Launch --------------------
+def main():
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--reload", action="store_true", default=settings.get_bool("UVICORN_RELOAD"),
+                        help="development mode: single process with auto-reload")
+    parser.add_argument("--workers", type=int, help="override the detected worker count")
+    args = parser.parse_args()
+
+    if args.reload:
+        uvicorn.run("main:app", host=HOST, port=PORT, reload=True)
+        return
+
+    cpus = available_cpus()
+    workers = args.workers or worker_count()
+    # Only fill in what neither the environment nor .env sets; workers inherit os.environ
+    if not settings.get("HASH_POOL_WORKERS"):
+        # Every worker has its own Argon2 process pool; share the cores between them
+        os.environ["HASH_POOL_WORKERS"] = str(max(1, cpus // workers))
+    if workers > 1 and not settings.get("PROMETHEUS_MULTIPROC_DIR"):
+        # Workers inherit this, so /metrics on any of them covers all of them
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+
+    uvicorn.run(
+        "main:app",
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        loop="uvloop" if has_module("uvloop") else "asyncio",
+        http="httptools" if has_module("httptools") else "h11",
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        timeout_keep_alive=KEEPALIVE_TIMEOUT,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
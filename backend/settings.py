@@ -0,0 +1,45 @@
+import os
+from functools import lru_cache
+from pathlib import Path
+
+ENV_FILE = Path(__file__).parent / ".env"
+
+
+# -------------------- Settings --------------------
+class Settings:
+    """Process configuration: environment variables, with backend/.env filling in
+    any that are unset. Use get_settings(); the .env file is read once per process
+    and may be absent (containers pass real environment variables instead)."""
+
+    def __init__(self, env_file: Path = ENV_FILE):
+        self.env_file = env_file if env_file.exists() else None
+        if self.env_file is not None:
+            from dotenv import load_dotenv
+            load_dotenv(self.env_file)
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        return os.environ.get(name, default)
+
+    def get_int(self, name: str, default: int) -> int:
+        value = os.environ.get(name)
+        return int(value) if value else default
+
+    def get_float(self, name: str, default: float) -> float:
+        value = os.environ.get(name)
+        return float(value) if value else default
+
+    def get_bool(self, name: str, default: bool = False) -> bool:
+        value = os.environ.get(name)
+        return value.lower() in ("1", "true", "yes") if value else default
+
+    def get_list(self, name: str) -> list[str]:
+        """Comma-separated values, blanks dropped."""
+        return [item.strip() for item in os.environ.get(name, "").split(",") if item.strip()]
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,42 @@
+import asyncio
+from metrics import SINGLEFLIGHT_CALLS
+
+
+# -------------------- Request coalescing --------------------
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one.
+
+    The first caller starts the work; anyone asking for the same key before it
+    finishes awaits the same result instead of issuing their own query. The
+    work runs as its own task, so a cancelled caller (e.g. a client that hung
+    up) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executed = 0
+        self.collapsed = 0
+        self._inflight: dict = {}
+
+    async def do(self, key, fn):
+        task = self._inflight.get(key)
+        if task is None:
+            self.executed += 1
+            SINGLEFLIGHT_CALLS.labels(self.name, "executed").inc()
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.collapsed += 1
+            SINGLEFLIGHT_CALLS.labels(self.name, "collapsed").inc()
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"executed": self.executed, "collapsed": self.collapsed, "in_flight": len(self._inflight)}
@@ -0,0 +1,63 @@
+"""Helpers for tests that drive the app in-process against mongomock-motor.
+
+The database is wrapped so every collection operation issued while handling
+a request is recorded; see the mongo fixture in conftest.py.
+"""
+import asyncio
+import httpx
+
+from main import app
+
+# Collection methods that each cost one round trip (a find() cursor's first batch included)
+OPERATIONS = {
+    "find", "find_one", "find_one_and_update", "find_one_and_delete", "insert_one", "insert_many",
+    "update_one", "update_many", "replace_one", "delete_one", "delete_many", "count_documents", "aggregate",
+}
+PASSWORD = "correct horse battery staple"
+
+
+class CountingCollection:
+    def __init__(self, collection, calls: list):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in OPERATIONS:
+            def counted(*args, **kwargs):
+                self._calls.append((self._collection.name, name))
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.calls: list[tuple[str, str]] = []
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._database, name), self.calls)
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self.calls)
+
+
+def run(scenario):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+async def login(client) -> dict:
+    resp = await client.post("/login", data={"username": "alice", "password": PASSWORD})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def measure(mongo, request) -> tuple[httpx.Response, list]:
+    mongo.calls.clear()
+    resp = await request
+    return resp, list(mongo.calls)
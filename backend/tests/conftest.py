@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Read by the app modules at import, so set before any test imports them
+os.environ.update({
+    "RATE_LIMIT_ENABLED": "false",
+    "OUTBOX_WORKER_ENABLED": "false",
+    "CACHE_BACKEND": "memory",
+    "JWT_CLAIMS_MODE": "false",
+    "HASH_POOL_WORKERS": "1",
+    # Cheapest Argon2 parameters; these tests count queries, not hashes
+    "ARGON2_TIME_COST": "1",
+    "ARGON2_MEMORY_COST": "8",
+    "ARGON2_PARALLELISM": "1",
+})
+
+import database  # noqa: E402
+from apptest import PASSWORD, CountingDatabase  # noqa: E402
+from auth import token_cache, user_cache  # noqa: E402
+from hashing import hash_password, hashing_service  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def stop_hashing_pool():
+    yield
+    hashing_service.shutdown()
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """A fresh database holding one user, alice, with the app's caches emptied."""
+    counting = CountingDatabase(AsyncMongoMockClient()["test_user_auth_db"])
+    monkeypatch.setattr(database, "get_database", lambda: counting)
+    asyncio.run(user_cache.delete(("username", "alice")))
+    token_cache.clear()
+    asyncio.run(counting.users.insert_one(
+        {"username": "alice", "email": "alice@example.com", "password": hash_password(PASSWORD), "bio": "hi"}
+    ))
+    counting.calls.clear()
+    return counting
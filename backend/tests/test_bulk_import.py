@@ -0,0 +1,35 @@
+"""Parsing of bulk import input."""
+import asyncio
+
+from bulk_import import lines_from_chunks, parse_rows
+
+
+def parse(text: str, fmt: str = "csv", chunk_size: int = 7) -> list:
+    async def chunks():
+        data = text.encode()
+        for i in range(0, len(data), chunk_size):
+            yield data[i:i + chunk_size]
+
+    async def main():
+        return [row async for row in parse_rows(lines_from_chunks(chunks()), fmt)]
+    return asyncio.run(main())
+
+
+def test_csv_quoted_fields_may_span_lines():
+    rows = parse(
+        'username,email,password\r\n'
+        '\r\n'
+        'alice,alice@example.com,"two\r\nlines, ""quoted"""\r\n'
+        'bob,bob@example.com\r\n'
+        'carol,carol@example.com,"blank\n\nline"\n'
+    )
+    assert rows == [
+        (1, {"username": "alice", "email": "alice@example.com", "password": 'two\nlines, "quoted"'}, None),
+        (2, None, "expected 3 columns, got 2"),
+        (3, {"username": "carol", "email": "carol@example.com", "password": "blank\n\nline"}, None),
+    ]
+
+
+def test_csv_unterminated_quote_is_reported():
+    rows = parse('username,email,password\nalice,alice@example.com,"secret\n')
+    assert rows == [(1, None, "unterminated quoted field")]
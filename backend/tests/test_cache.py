@@ -0,0 +1,102 @@
+"""RedisCache against fakeredis: two caches on one server stand in for two workers."""
+import asyncio
+import fakeredis
+import redis
+from bson import ObjectId
+
+from cache import LocalCache, RedisCache
+
+USER = {"_id": ObjectId(), "username": "alice", "bio": "hi"}
+
+
+def run(scenario):
+    async def main():
+        server = fakeredis.FakeServer()
+        workers = [RedisCache("users", 30, client=fakeredis.aioredis.FakeRedis(server=server)) for _ in range(2)]
+        for cache in workers:
+            await cache.start()
+        try:
+            return await scenario(server, *workers)
+        finally:
+            for cache in workers:
+                await cache.close()
+    return asyncio.run(main())
+
+
+async def settle():
+    # Let the other worker's listener handle the invalidation message
+    await asyncio.sleep(0.05)
+
+
+def test_workers_share_entries_through_one_mget():
+    async def scenario(server, a, b):
+        await a.set_many({("username", "alice"): USER, ("_id", str(USER["_id"])): USER})
+        return await b.get_many([("username", "alice"), ("username", "bob"), ("_id", str(USER["_id"]))]), b.stats()
+
+    values, stats = run(scenario)
+    assert values == [USER, None, USER]
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+def test_entries_expire_after_their_ttl():
+    async def scenario(server, a, b):
+        await a.set(("username", "alice"), USER, ttl=0.05)
+        await asyncio.sleep(0.1)
+        return await b.get(("username", "alice"))
+
+    assert run(scenario) is None
+
+
+def test_write_evicts_other_workers_near_cache():
+    async def scenario(server, a, b):
+        await a.set(("username", "alice"), USER)
+        await b.get(("username", "alice"))  # now in b's near cache
+        before = b.invalidations
+        await a.set(("username", "alice"), {**USER, "bio": "new"})
+        await settle()
+        return await b.get(("username", "alice")), b.invalidations - before
+
+    value, invalidations = run(scenario)
+    assert value["bio"] == "new"
+    assert invalidations == 1
+
+
+def test_delete_evicts_other_workers_near_cache():
+    async def scenario(server, a, b):
+        await a.set(("username", "alice"), USER)
+        await b.get(("username", "alice"))
+        await a.delete(("username", "alice"))
+        await settle()
+        return await b.get(("username", "alice"), "gone")
+
+    assert run(scenario) == "gone"
+
+
+def test_lost_subscription_clears_near_cache():
+    async def scenario(server, a, b):
+        await a.set(("username", "alice"), USER)
+        await b.get(("username", "alice"))
+        near_before = b.stats()["near"]["size"]
+        # Invalidations sent while disconnected would be missed, so nothing cached may be trusted
+        pubsub = b._pubsub
+
+        async def dropped(*args, **kwargs):
+            raise redis.ConnectionError("Connection closed by server.")
+
+        pubsub.parse_response = dropped
+        # Wake the listener (for an unrelated key) so its next read hits the dropped connection
+        await a.set(("username", "bob"), USER)
+        await settle()
+        return near_before, b.stats()["near"]["size"]
+
+    assert run(scenario) == (1, 0)
+
+
+def test_local_cache_implements_the_same_interface():
+    async def scenario():
+        cache = LocalCache(maxsize=10, ttl=30)
+        await cache.set_many({"a": 1, "b": 2})
+        await cache.delete("b")
+        return await cache.get_many(["a", "b"]), await cache.get("b", "default")
+
+    assert asyncio.run(scenario()) == ([1, None], "default")
@@ -0,0 +1,70 @@
+"""SMTPPool connection reuse, against a fake smtplib.SMTP."""
+import smtplib
+from types import SimpleNamespace
+
+import pytest
+
+import email_utils
+from email_utils import SMTPPool, build_otp_message
+
+
+class FakeSMTP:
+    instances: list = []
+
+    def __init__(self, host, port, timeout=None):
+        self.noops = 0
+        self.sent = 0
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        if password == "wrong":
+            raise smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+
+    def noop(self):
+        self.noops += 1
+        return 250, b"OK"
+
+    def send_message(self, msg):
+        self.sent += 1
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(email_utils.smtplib, "SMTP", FakeSMTP)
+    now = [1000.0]
+    monkeypatch.setattr(email_utils, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_only_long_idle_connections_are_probed(clock):
+    pool = SMTPPool("smtp.test", 587, username="app", password="secret", probe_after=30)
+    msg = build_otp_message("alice@example.com", "123456")
+
+    pool._send_blocking(msg)
+    clock[0] += 5
+    pool._send_blocking(msg)
+    clock[0] += 60
+    pool._send_blocking(msg)
+
+    [server] = FakeSMTP.instances
+    assert (server.sent, server.noops) == (3, 1)
+
+
+def test_failed_login_closes_the_socket(clock):
+    pool = SMTPPool("smtp.test", 587, username="app", password="wrong")
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        pool._send_blocking(build_otp_message("alice@example.com", "123456"))
+    [server] = FakeSMTP.instances
+    assert server.closed
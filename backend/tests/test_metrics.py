@@ -0,0 +1,42 @@
+"""Request metrics are labelled with each endpoint's full route template."""
+import asyncio
+import httpx
+from prometheus_client import REGISTRY
+
+from main import app
+
+
+def requests_for(method: str, route: str) -> float:
+    return sum(
+        REGISTRY.get_sample_value("http_requests_total", {"method": method, "route": route, "status": status}) or 0
+        for status in ("200", "401", "422")
+    )
+
+
+def get(*paths):
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in paths:
+                await client.get(path)
+    asyncio.run(main())
+
+
+def test_prefixed_routes_get_their_own_labels():
+    before = {route: requests_for("GET", route) for route in ("/me", "/users/me", "/users/profiles")}
+    # Unauthenticated, so 401/422, but the route has already been matched
+    get("/me", "/users/me", "/users/me", "/users/profiles?usernames=alice")
+    assert requests_for("GET", "/me") - before["/me"] == 1
+    assert requests_for("GET", "/users/me") - before["/users/me"] == 2
+    assert requests_for("GET", "/users/profiles") - before["/users/profiles"] == 1
+
+
+def test_unmatched_paths_share_one_label():
+    def not_found() -> float:
+        return REGISTRY.get_sample_value(
+            "http_requests_total", {"method": "GET", "route": "unmatched", "status": "404"}
+        ) or 0
+
+    before = not_found()
+    get("/no-such-page", "/users/no/such/page")
+    assert not_found() - before == 2
@@ -0,0 +1,38 @@
+"""Outbox delivery and its metrics, against mongomock-motor."""
+import asyncio
+
+import outbox
+from metrics import REGISTRY
+from outbox import OutboxWorker, enqueue_otp_email
+
+
+def sample(name: str, labels: dict | None = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+def test_delivery_observes_lag_and_refreshes_depth(mongo, monkeypatch):
+    sent = []
+
+    async def send(to, otp):
+        if to == "bounce@example.com":
+            raise ConnectionError("mail server unavailable")
+        sent.append(to)
+
+    monkeypatch.setattr(outbox, "send_otp_email", send)
+    worker = OutboxWorker(max_attempts=1, depth_interval=60)
+    lag_before = sample("outbox_delivery_lag_seconds_count")
+
+    async def scenario():
+        await enqueue_otp_email("alice@example.com", "123456")
+        await enqueue_otp_email("bounce@example.com", "654321")
+        await worker.run_once()
+        await worker.refresh_depth()
+        await enqueue_otp_email("bob@example.com", "111111")
+        # Within depth_interval, so not recounted yet
+        await worker.refresh_depth()
+
+    asyncio.run(scenario())
+    assert sent == ["alice@example.com"]
+    assert sample("outbox_delivery_lag_seconds_count") - lag_before == 1
+    assert sample("outbox_depth", {"status": "queued"}) == 0
+    assert sample("outbox_depth", {"status": "failed"}) == 1
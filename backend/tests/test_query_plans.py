@@ -0,0 +1,30 @@
+"""Every query shape in indexes.QUERY_SHAPES is served by an index.
+
+mongomock has no query planner, so this needs a real mongod: set MONGO_URL,
+e.g. MONGO_URL=mongodb://localhost:27017. Runs in a scratch database.
+"""
+import asyncio
+import os
+
+import pytest
+
+import database
+from indexes import check_query_plans, ensure_indexes
+
+pytestmark = pytest.mark.skipif(not os.environ.get("MONGO_URL"), reason="needs MONGO_URL pointing at a mongod")
+
+
+def test_query_shapes_use_an_index(monkeypatch):
+    monkeypatch.setattr(database, "MONGO_DB_NAME", "test_query_plans")
+
+    async def scenario():
+        client = database.get_client()
+        try:
+            await client.drop_database("test_query_plans")
+            await ensure_indexes()
+            return await check_query_plans()
+        finally:
+            await client.drop_database("test_query_plans")
+            database.close_client()
+
+    assert asyncio.run(scenario()) == []
@@ -0,0 +1,122 @@
+"""Sliding-window rate limiting, against InMemoryBackend with a controlled clock."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import ratelimit
+from apptest import PASSWORD, measure, run
+from hashing import hashing_service
+from ratelimit import LIMITS, InMemoryBackend, Limit, RateLimiter, rate_limiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Seconds since the epoch as seen by the limiter; assign clock.now to move it."""
+    clock = SimpleNamespace(now=600.0)
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=lambda: clock.now))
+    monkeypatch.setitem(LIMITS, "login_ip", Limit("login_ip", "30/60"))
+    monkeypatch.setitem(LIMITS, "login_username", Limit("login_username", "10/60"))
+    monkeypatch.setitem(LIMITS, "signup_ip", Limit("signup_ip", "10/60"))
+    monkeypatch.setitem(LIMITS, "signup_email", Limit("signup_email", "3/300"))
+    return clock
+
+
+def attempts(limiter: RateLimiter, count: int, key: str = "alice") -> list:
+    """Retry-After of each of `count` login attempts for `key`; None where allowed."""
+    async def main():
+        results = []
+        for _ in range(count):
+            try:
+                await limiter.enforce(("login_username", key))
+                results.append(None)
+            except HTTPException as exc:
+                assert exc.status_code == 429
+                results.append(exc.headers["Retry-After"])
+        return results
+    return asyncio.run(main())
+
+
+# -------------------- Limiter --------------------
+def test_over_limit_is_429_until_the_window_ends(clock):
+    limiter = RateLimiter(InMemoryBackend(), enabled=True)
+    clock.now = 615.0  # 15 s into the window starting at 600
+
+    assert attempts(limiter, 11) == [None] * 10 + ["45"]
+    assert attempts(limiter, 1, key="bob") == [None]
+
+
+def test_previous_window_counts_by_its_remaining_overlap(clock):
+    limiter = RateLimiter(InMemoryBackend(), enabled=True)
+    clock.now = 605.0
+    attempts(limiter, 10)
+    # 45 s into the next window a quarter of it still overlaps: 10 * 0.25 = 2.5,
+    # so 7 more attempts fit under the limit of 10
+    clock.now = 705.0
+
+    assert attempts(limiter, 8) == [None] * 7 + ["15"]
+
+
+def test_counts_reset_once_the_previous_window_is_gone(clock):
+    limiter = RateLimiter(InMemoryBackend(), enabled=True)
+    clock.now = 605.0
+    attempts(limiter, 11)
+    clock.now = 725.0
+
+    assert attempts(limiter, 10) == [None] * 10
+
+
+def test_disabled_limiter_never_counts(clock):
+    assert attempts(RateLimiter(InMemoryBackend(), enabled=False), 20) == [None] * 20
+
+
+# -------------------- Endpoints --------------------
+@pytest.fixture
+def limited(clock, monkeypatch):
+    """Enable the app's limiter on a fresh backend and record Argon2 work."""
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "backend", InMemoryBackend())
+    hashes = []
+    run_hash = hashing_service._run
+
+    async def counted(operation, *args, **kwargs):
+        hashes.append(operation)
+        return await run_hash(operation, *args, **kwargs)
+
+    monkeypatch.setattr(hashing_service, "_run", counted)
+    return hashes
+
+
+def test_login_is_limited_before_lookup_and_verify(mongo, limited):
+    async def scenario(client):
+        form = {"username": "alice", "password": "wrong"}
+        for _ in range(10):
+            assert (await client.post("/login", data=form)).status_code == 401
+        limited.clear()
+        blocked = await measure(mongo, client.post("/login", data=form))
+        # Per username, so the right password does not get through either
+        right = await client.post("/login", data={**form, "password": PASSWORD})
+        return blocked, right
+
+    (resp, calls), right = run(scenario)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "60"
+    assert calls == []
+    assert limited == []
+    assert right.status_code == 429
+
+
+def test_signup_is_limited_before_lookup_and_hash(mongo, limited):
+    async def scenario(client):
+        body = {"username": "carol", "email": "carol@example.com", "password": PASSWORD}
+        for _ in range(3):
+            assert (await client.post("/signup-request", json=body)).status_code == 200
+        limited.clear()
+        return await measure(mongo, client.post("/signup-request", json=body))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "300"
+    assert calls == []
+    assert limited == []
@@ -0,0 +1,67 @@
+"""Refresh token rotation and reuse detection, against mongomock-motor."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from refresh_tokens import _digest, issue_refresh_token, rotate_refresh_token
+
+
+def issue(mongo) -> str:
+    async def scenario():
+        alice = await mongo.users.find_one({"username": "alice"})
+        return await issue_refresh_token(alice)
+    return asyncio.run(scenario())
+
+
+def rotate(token: str):
+    try:
+        return asyncio.run(rotate_refresh_token(token))
+    except HTTPException as exc:
+        return exc.status_code
+
+
+def family_size(mongo, token: str) -> int:
+    async def scenario():
+        record = await mongo.refresh_tokens.find_one({"_id": _digest(token)})
+        return await mongo.refresh_tokens.count_documents({"family": record["family"]}) if record else 0
+    return asyncio.run(scenario())
+
+
+def test_rotation_spends_the_token_and_returns_its_successor(mongo):
+    token = issue(mongo)
+
+    record, successor = rotate(token)
+
+    assert (record["_id"], record["username"]) == (_digest(token), "alice")
+    assert successor != token
+    assert asyncio.run(mongo.refresh_tokens.find_one({"_id": _digest(token)}))["used"]
+    next_record, _ = rotate(successor)
+    assert next_record["family"] == record["family"]
+
+
+def test_reusing_a_spent_token_revokes_its_family(mongo):
+    token = issue(mongo)
+    _, successor = rotate(token)
+
+    assert rotate(token) == 401
+    assert asyncio.run(mongo.refresh_tokens.count_documents({})) == 0
+    # The successor, possibly held by whoever stole the token, is gone too
+    assert rotate(successor) == 401
+
+
+def test_expired_token_is_rejected_without_revoking_its_family(mongo):
+    token = issue(mongo)
+    _, successor = rotate(token)
+    asyncio.run(mongo.refresh_tokens.update_one(
+        {"_id": _digest(successor)}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+    ))
+
+    assert rotate(successor) == 401
+    assert family_size(mongo, token) == 2
+
+
+@pytest.mark.parametrize("token", ["", "not-a-token"])
+def test_unknown_token_is_rejected(mongo, token):
+    assert rotate(token) == 401
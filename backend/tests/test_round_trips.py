@@ -0,0 +1,108 @@
+"""MongoDB round trips per request for the login and profile endpoints.
+
+The app runs in-process against mongomock-motor, behind a database wrapper
+that records every collection operation issued while handling a request
+(see apptest.py).
+"""
+import pytest
+
+from apptest import PASSWORD, login, measure, run
+from auth import user_cache
+
+
+# -------------------- Login --------------------
+def test_login_reads_user_once_and_stores_refresh_token(mongo):
+    async def scenario(client):
+        return await measure(mongo, client.post("/login", data={"username": "alice", "password": PASSWORD}))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 200
+    assert calls == [("users", "find_one"), ("refresh_tokens", "insert_one")]
+
+
+# -------------------- /me --------------------
+def test_me_cache_miss_is_one_read(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        await user_cache.delete(("username", "alice"))
+        return await measure(mongo, client.get("/me", headers=headers))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 200
+    assert calls == [("users", "find_one")]
+
+
+def test_me_cache_hit_is_free(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        await client.get("/me", headers=headers)
+        return await measure(mongo, client.get("/me", headers=headers))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 200
+    assert calls == []
+
+
+def test_me_revalidation_on_cache_miss_reads_only_the_version(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        etag = (await client.get("/me", headers=headers)).headers["ETag"]
+        await user_cache.delete(("username", "alice"))
+        return await measure(mongo, client.get("/me", headers={**headers, "If-None-Match": etag}))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 304
+    assert calls == [("users", "find_one")]
+
+
+# -------------------- /users/me --------------------
+def test_profile_cache_miss_is_one_read(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        await user_cache.delete(("username", "alice"))
+        return await measure(mongo, client.get("/users/me", headers=headers))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 200
+    assert resp.json()["bio"] == "hi"
+    assert calls == [("users", "find_one")]
+
+
+def test_profile_cache_hit_is_free(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        await client.get("/users/me", headers=headers)
+        return await measure(mongo, client.get("/users/me", headers=headers))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 200
+    assert calls == []
+
+
+@pytest.mark.parametrize("method", ["post", "put"])
+def test_bio_write_is_one_round_trip(mongo, method):
+    async def scenario(client):
+        headers = await login(client)
+        await client.get("/users/me", headers=headers)
+        resp, calls = await measure(mongo, client.request(method.upper(), "/users/me/bio", json={"bio": "new"},
+                                                          headers=headers))
+        # The write refreshed the cache, so reading it back costs nothing
+        after, read_calls = await measure(mongo, client.get("/users/me", headers=headers))
+        return resp, calls, after, read_calls
+
+    resp, calls, after, read_calls = run(scenario)
+    assert resp.status_code in (200, 201)
+    assert calls == [("users", "find_one_and_update")]
+    assert after.json()["bio"] == "new"
+    assert read_calls == []
+
+
+def test_bio_delete_is_one_round_trip(mongo):
+    async def scenario(client):
+        headers = await login(client)
+        await client.get("/users/me", headers=headers)
+        return await measure(mongo, client.delete("/users/me/bio", headers=headers))
+
+    resp, calls = run(scenario)
+    assert resp.status_code == 204
+    assert calls == [("users", "find_one_and_update")]
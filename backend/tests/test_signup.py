@@ -0,0 +1,56 @@
+"""Signup OTP records: one per email, and never accepted once expired."""
+import asyncio
+from datetime import datetime, timedelta
+
+from apptest import PASSWORD, run
+
+CAROL = {"username": "carol", "email": "carol@example.com", "password": PASSWORD}
+
+
+def store_otp(mongo, **fields):
+    asyncio.run(mongo.otp_verifications.insert_one({
+        "email": CAROL["email"], "username": "carol", "password": "$argon2id$...", "otp": "123456",
+        "verified": False, "created_at": datetime.utcnow(), **fields,
+    }))
+
+
+def verify(otp: str = "123456"):
+    async def scenario(client):
+        return await client.post("/signup-verify", json={"email": CAROL["email"], "otp": otp})
+    return run(scenario)
+
+
+def test_otp_past_expires_at_is_rejected(mongo):
+    store_otp(mongo, expires_at=datetime.utcnow() - timedelta(seconds=1))
+
+    resp = verify()
+    assert (resp.status_code, resp.json()["detail"]) == (400, "OTP has expired")
+    assert asyncio.run(mongo.users.find_one({"username": "carol"})) is None
+
+
+def test_legacy_otp_without_expires_at_is_rejected(mongo):
+    store_otp(mongo)
+
+    resp = verify()
+    assert (resp.status_code, resp.json()["detail"]) == (400, "OTP has expired")
+
+
+def test_valid_otp_creates_the_account(mongo):
+    store_otp(mongo, expires_at=datetime.utcnow() + timedelta(minutes=5))
+
+    assert verify().status_code == 200
+    assert asyncio.run(mongo.users.find_one({"username": "carol"}))["email"] == CAROL["email"]
+    assert asyncio.run(mongo.otp_verifications.count_documents({})) == 0
+
+
+def test_repeated_signup_request_replaces_the_otp(mongo):
+    async def scenario(client):
+        for _ in range(2):
+            assert (await client.post("/signup-request", json=CAROL)).status_code == 200
+        return [doc async for doc in mongo.otp_verifications.find({"email": CAROL["email"]})]
+
+    records = run(scenario)
+    assert len(records) == 1
+    # The code that counts is the one in the latest email
+    outbox = asyncio.run(mongo.email_outbox.find({"to": CAROL["email"]}).sort("_id", -1).to_list(None))
+    assert records[0]["otp"] == outbox[0]["otp"]
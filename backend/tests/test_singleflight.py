@@ -0,0 +1,31 @@
+"""Concurrent cache misses for one user share a single MongoDB read."""
+import asyncio
+
+from apptest import login, run
+from auth import user_cache, user_lookups
+
+
+def test_concurrent_misses_for_one_user_run_one_query(mongo, monkeypatch):
+    # mongomock answers without yielding to the loop; a real read takes a while,
+    # long enough for the other requests to miss the cache too
+    collection = type(mongo._database.users)
+    find_one = collection.find_one
+
+    async def slow_find_one(self, *args, **kwargs):
+        await asyncio.sleep(0.01)
+        return await find_one(self, *args, **kwargs)
+
+    monkeypatch.setattr(collection, "find_one", slow_find_one)
+
+    async def scenario(client):
+        headers = await login(client)
+        await user_cache.delete(("username", "alice"))
+        mongo.calls.clear()
+        collapsed = user_lookups.collapsed
+        responses = await asyncio.gather(*(client.get("/users/me", headers=headers) for _ in range(5)))
+        return responses, list(mongo.calls), user_lookups.collapsed - collapsed
+
+    responses, calls, collapsed = run(scenario)
+    assert [resp.status_code for resp in responses] == [200] * 5
+    assert calls == [("users", "find_one")]
+    assert collapsed == 4